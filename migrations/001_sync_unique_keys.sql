@@ -0,0 +1,12 @@
+-- Claves naturales usadas por upsert_many (INSERT ... ON CONFLICT) en los syncs.
+-- Los syncs anteriores ya filtraban duplicados en Python, por lo que las
+-- tablas existentes deberían cumplir estas restricciones.
+
+CREATE UNIQUE INDEX IF NOT EXISTS posts_post_external_id_key
+    ON posts (post_external_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS comments_comment_external_id_key
+    ON comments (comment_external_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS reactions_post_user_type_key
+    ON reactions (post_external_id, user_external_id, reaction_type);
@@ -0,0 +1,12 @@
+-- Marcas de agua para los syncs incrementales.
+--   scope = 'page_posts'    -> external_id = page_external_id
+--   scope = 'post_comments' -> external_id = post_external_id
+
+CREATE TABLE IF NOT EXISTS sync_watermarks (
+    scope TEXT NOT NULL,
+    external_id TEXT NOT NULL,
+    last_created_time TIMESTAMPTZ,
+    cursor TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (scope, external_id)
+);
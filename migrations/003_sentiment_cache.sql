@@ -0,0 +1,11 @@
+-- Cache persistente de resultados de sentimiento.
+-- text_hash = sha256 del texto normalizado; model_version identifica los
+-- modelos que produjeron el resultado.
+
+CREATE TABLE IF NOT EXISTS sentiment_cache (
+    text_hash TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (text_hash, model_version)
+);
@@ -0,0 +1,5 @@
+-- Índice para la paginación por cursor de /posts
+-- (WHERE page_id = ? AND (created_time, post_id) < (?, ?) ORDER BY created_time DESC, post_id DESC)
+
+CREATE INDEX IF NOT EXISTS posts_page_created_post_idx
+    ON posts (page_id, created_time DESC, post_id DESC);
@@ -0,0 +1,8 @@
+-- Índices para servir /comments desde la base de datos con paginación por
+-- cursor sobre (created_time, comment_id), por página o filtrado por post.
+
+CREATE INDEX IF NOT EXISTS comments_post_created_comment_idx
+    ON comments (post_id, created_time DESC, comment_id DESC);
+
+CREATE INDEX IF NOT EXISTS comments_created_comment_idx
+    ON comments (created_time DESC, comment_id DESC);
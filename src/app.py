@@ -1,7 +1,11 @@
+import json
 from flask import Flask
 from dotenv import load_dotenv
 from routes.api_routes import api_blueprint
 from routes.sync_routes import sync_blueprint
+from services.sentiment import warm_up
+from services.bulk_sync import start_bulk_sync
+from utils.config import SENTIMENT_WARMUP
 
 load_dotenv()
 
@@ -11,5 +15,17 @@ app = Flask(__name__)
 app.register_blueprint(api_blueprint)
 app.register_blueprint(sync_blueprint)
 
+# Los modelos de sentimiento cargan al primer uso salvo que se pida precarga
+if SENTIMENT_WARMUP:
+    warm_up()
+
+
+@app.cli.command("sync-all")
+def sync_all_command():
+    """Sincroniza todos los usuarios e imprime el reporte por tenant."""
+    bulk = start_bulk_sync(wait=True)
+    print(json.dumps(bulk.to_dict(), indent=2, default=str))
+
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=3000)
@@ -1,113 +1,228 @@
 from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request
-from services.database_service import execute_query
+from psycopg2 import sql
+from services.database_service import execute_query, iter_query
 from utils.config import PAGE_ID
-from services.facebook_service import fb_api
-from services.sentiment import AnalizadorTransformers
+from services.graph_client import graph_client
+from services.sentiment import get_analizador
 from services.facebook_service import fetch_page_metric
+from services.response_cache import cached_response
+from services.tenant_context import resolve_tenant
+from utils.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields
+from utils.streaming import stream_rows, STREAM_FORMATS
 api_blueprint = Blueprint('api', __name__)
-analizador = AnalizadorTransformers()
 
 
 def get_user_page_data(user_id: int):
-    result = execute_query(
-        """
-        SELECT p.page_id, p.page_external_id, u.access_token
-        FROM pages p
-        JOIN users u ON u.user_id = p.user_id
-        WHERE u.user_id = %s
-        """,
-        (user_id,),
-        fetch=True
-    )
-    if not result:
-        raise Exception("Usuario o página no encontrada")
-    return result[0]
+    # Una sola consulta por request, compartida con los servicios
+    return resolve_tenant(user_id)
+
+
+POST_FIELDS = ("post_id", "post_external_id", "page_id", "message", "created_time")
 
 
 @api_blueprint.route("/posts")
+@cached_response()
 def get_posts():
+    """
+    Posts de la página del usuario, del más reciente al más antiguo.
+
+    Sin `limit` ni `after` devuelve la lista completa como antes. Con
+    cualquiera de los dos pagina por cursor sobre (created_time, post_id) y
+    responde `{"data": [...], "paging": {"after": cursor}}`. `fields=a,b`
+    limita las columnas devueltas. `stream=json|ndjson` (solo sin paginar)
+    envía la lista a medida que se lee con un cursor de servidor.
+    """
     try:
         user_id = request.args.get("user_id", type=int)
         if not user_id:
             return jsonify({"error": "user_id es requerido"}), 400
 
+        try:
+            fields = parse_fields(request.args.get("fields"), POST_FIELDS)
+            after = request.args.get("after")
+            paginated = after is not None or "limit" in request.args
+            limit = parse_limit(request.args.get("limit", type=int))
+            cursor = decode_cursor(after) if after else None
+            stream = request.args.get("stream")
+            if stream and (paginated or stream not in STREAM_FORMATS):
+                raise ValueError("stream admite json o ndjson y no se combina con limit/after")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         user_data = get_user_page_data(user_id)
 
-        posts = execute_query(
-            """
-            SELECT p.* 
-            FROM posts p 
-            WHERE p.page_id = %s
-            ORDER BY p.created_time DESC
-            """,
-            (user_data["page_id"],),
-            fetch=True
-        )
-        return jsonify(posts)
+        if fields:
+            # created_time y post_id siempre se leen: forman el cursor
+            columns = fields + [c for c in ("created_time", "post_id") if c not in fields]
+            projection = sql.SQL(", ").join(sql.Identifier("p", c) for c in columns)
+        else:
+            projection = sql.SQL("p.*")
+
+        query = sql.SQL("SELECT {} FROM posts p WHERE p.page_id = %s").format(projection)
+        params = [user_data["page_id"]]
+
+        if cursor:
+            query += sql.SQL(" AND (p.created_time, p.post_id) < (%s, %s)")
+            params.extend(cursor)
+        query += sql.SQL(" ORDER BY p.created_time DESC, p.post_id DESC")
+        if paginated:
+            query += sql.SQL(" LIMIT %s")
+            params.append(limit + 1)
+
+        if stream:
+            rows = iter_query(query, tuple(params))
+            if fields:
+                rows = ({f: post[f] for f in fields} for post in rows)
+            return stream_rows(rows, stream)
+
+        posts = execute_query(query, tuple(params), fetch=True)
+
+        next_cursor = None
+        if paginated and len(posts) > limit:
+            posts = posts[:limit]
+            next_cursor = encode_cursor(posts[-1]["created_time"], posts[-1]["post_id"])
+
+        if fields:
+            posts = [{f: post[f] for f in fields} for post in posts]
+
+        if not paginated:
+            return jsonify(posts)
+        return jsonify({"data": posts, "paging": {"after": next_cursor}})
     except Exception as e:
         print("Error al obtener posts:", e)
         return jsonify({"error": "Error al obtener posts"}), 500
 
 
+COMMENT_FIELDS = ("comment_id", "comment_external_id", "post_id", "user_name",
+                  "message", "created_time", "sentiment")
+
+
 @api_blueprint.route("/comments")
 def get_all_comments():
     """
-    Obtiene todos los comentarios desde la API de Facebook para los posts del usuario.
-    No guarda en la base de datos, solo analiza sentimiento y retorna.
+    Comentarios de los posts del usuario.
+
+    Por defecto se leen de la tabla `comments` (ya sincronizada y con
+    sentimiento), paginados por cursor sobre (created_time, comment_id) con
+    `limit`/`after` y filtros opcionales `post_id`, `since`, `until` (ISO
+    8601) y `sentiment`. Con `live=true` se consultan la API de Facebook y
+    el modelo en el momento, sin guardar nada.
     """
     try:
         user_id = request.args.get("user_id", type=int)
         if not user_id:
             return jsonify({"error": "user_id es requerido"}), 400
 
-        # Obtener access_token y page_external_id desde la base de datos
+        stream = request.args.get("stream")
+        if stream and stream not in STREAM_FORMATS:
+            return jsonify({"error": "stream admite json o ndjson"}), 400
+
         user_data = get_user_page_data(user_id)
-        access_token = user_data["access_token"]
-        page_external_id = user_data["page_external_id"]
 
-        # Obtener posts de la página
-        posts_data = fb_api(f"/{page_external_id}/posts", "GET", {
-            "fields": "id"
-        }, access_token=access_token)
+        if request.args.get("live", "false").lower() == "true":
+            return _comments_live(user_data, stream)
+        return _comments_from_db(user_data, stream)
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error al obtener comentarios: {e}")
+        return jsonify({"error": str(e)}), 500
 
-        all_comments = []
 
-        # Para cada post, obtener sus comentarios
-        for post in posts_data.get("data", []):
-            post_id = post["id"]
-            comments = fb_api(f"/{post_id}/comments", "GET", {
+def _comments_from_db(user_data, stream=None):
+    after = request.args.get("after")
+    limit = parse_limit(request.args.get("limit", type=int))
+    cursor = decode_cursor(after) if after else None
+
+    query = sql.SQL("SELECT {} FROM comments c JOIN posts p ON p.post_id = c.post_id WHERE p.page_id = %s").format(
+        sql.SQL(", ").join(sql.Identifier("c", f) for f in COMMENT_FIELDS))
+    params = [user_data["page_id"]]
+
+    post_id = request.args.get("post_id", type=int)
+    if post_id:
+        query += sql.SQL(" AND c.post_id = %s")
+        params.append(post_id)
+    if request.args.get("since"):
+        query += sql.SQL(" AND c.created_time >= %s")
+        params.append(datetime.fromisoformat(request.args["since"]))
+    if request.args.get("until"):
+        query += sql.SQL(" AND c.created_time < %s")
+        params.append(datetime.fromisoformat(request.args["until"]))
+    if request.args.get("sentiment"):
+        query += sql.SQL(" AND c.sentiment = %s")
+        params.append(request.args["sentiment"])
+    if cursor:
+        query += sql.SQL(" AND (c.created_time, c.comment_id) < (%s, %s)")
+        params.extend(cursor)
+
+    query += sql.SQL(" ORDER BY c.created_time DESC, c.comment_id DESC")
+
+    # En streaming se envían todas las filas que cumplen los filtros
+    if stream:
+        return stream_rows(iter_query(query, tuple(params)), stream)
+
+    query += sql.SQL(" LIMIT %s")
+    params.append(limit + 1)
+    comments = execute_query(query, tuple(params), fetch=True)
+
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1]["created_time"], comments[-1]["comment_id"])
+
+    return jsonify({"data": comments, "paging": {"after": next_cursor}})
+
+
+def _comments_live(user_data, stream=None):
+    access_token = user_data["access_token"]
+    page_external_id = user_data["page_external_id"]
+
+    def iter_text_pages():
+        # Todos los posts de la página y, para cada uno, sus comentarios
+        # página a página
+        posts = graph_client.iter_edge(f"/{page_external_id}/posts", {"fields": "id"},
+                                       access_token=access_token)
+        for post in posts:
+            pages = graph_client.iter_edge_pages(f"/{post['id']}/comments", {
                 "fields": "id,message,created_time"
-            }, access_token=access_token).get("data", [])
-
-            for comment in comments:
-                texto = comment.get("message", "")
-                sentimiento = analizador.analizar(
-                    texto) if texto.strip() else "neutral"
+            }, access_token=access_token, prefetch=True)
+            for comments, _ in pages:
+                yield [comment.get("message", "") for comment in comments]
 
-                all_comments.append({
-                    "text": texto,
-                    "sentiment": sentimiento
-                })
+    def comment_rows(textos):
+        resultados = get_analizador().analizar_lote(textos)
+        for texto, resultado in zip(textos, resultados):
+            yield {
+                "text": texto,
+                "sentiment": resultado if texto.strip() else "neutral"
+            }
 
-        return jsonify(all_comments)
+    if stream:
+        # Cada página se analiza en lote y se emite antes de pedir la siguiente
+        return stream_rows((row for textos in iter_text_pages()
+                            for row in comment_rows(textos)), stream)
 
-    except Exception as e:
-        print(f"❌ Error al obtener comentarios desde la API: {e}")
-        return jsonify({"error": str(e)}), 500
+    # Sin streaming: un solo análisis en lote para todos los comentarios
+    textos = [texto for pagina in iter_text_pages() for texto in pagina]
+    return jsonify(list(comment_rows(textos)))
 
 
 @api_blueprint.route("/metrics/impressions")
+@cached_response()
 def get_page_impressions():
     return _serve_metric("page_impressions")
 
 
 @api_blueprint.route("/metrics/fans")
+@cached_response()
 def get_page_fans():
     return _serve_metric("page_fans")
 
 
 @api_blueprint.route("/metrics/views")
+@cached_response()
 def get_page_views():
     return _serve_metric("page_views_total")
 
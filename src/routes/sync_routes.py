@@ -1,22 +1,72 @@
 from flask import request, jsonify, Blueprint
-from services.facebook_service import sync_posts, sync_comments, sync_post_reactions_summary, sync_all_page_metrics
+from services.sync_jobs import sync_queue
+from services.bulk_sync import start_bulk_sync, get_bulk_sync
 
 sync_blueprint = Blueprint('sync', __name__)
 
 
 @sync_blueprint.route("/sync-data", methods=["POST"])
 def sync_data():
+    """
+    Encola un sync del usuario y responde 202 con el job_id. Si el usuario
+    ya tiene un sync en curso responde 409 con el job existente. Con
+    `wait=true` espera a que termine (comportamiento anterior).
+    """
     try:
         user_id = request.args.get("user_id", type=int)
         if not user_id:
             return jsonify({"error": "user_id es requerido"}), 400
 
-        sync_posts(user_id)
-        sync_comments(user_id)
-        sync_post_reactions_summary(user_id)
-        sync_all_page_metrics(user_id)
+        if request.args.get("wait", "false").lower() == "true":
+            job, created = sync_queue.enqueue_and_wait(user_id)
+        else:
+            job, created = sync_queue.enqueue(user_id)
 
-        return jsonify({"status": "success", "message": "Datos sincronizados correctamente"})
+        if not created:
+            return jsonify({"error": "Ya hay un sync en curso para este usuario",
+                            "job": job.to_dict()}), 409
+        if job.status == "failed":
+            return jsonify({"error": job.error, "job": job.to_dict()}), 500
+        if job.status == "succeeded":
+            return jsonify({"status": "success", "message": "Datos sincronizados correctamente",
+                            "job": job.to_dict()})
+        return jsonify({"status": "queued", "job_id": job.job_id,
+                        "job": job.to_dict()}), 202
     except Exception as e:
         print(f"❌ Error en sync_data: {str(e)}")
         return jsonify({"error": str(e)}), 500
+
+
+@sync_blueprint.route("/sync-jobs/<job_id>")
+def get_sync_job(job_id):
+    job = sync_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify(job.to_dict())
+
+
+@sync_blueprint.route("/sync-all", methods=["POST"])
+def sync_all():
+    """
+    Sincroniza todos los usuarios con página sobre un pool compartido.
+    Responde 202 con el bulk_id; con `wait=true` espera y devuelve el
+    reporte por tenant (duración, peticiones y filas escritas).
+    """
+    try:
+        wait = request.args.get("wait", "false").lower() == "true"
+        bulk = start_bulk_sync(wait=wait)
+        if wait:
+            return jsonify(bulk.to_dict())
+        return jsonify({"status": "queued", "bulk_id": bulk.bulk_id,
+                        "sync": bulk.to_dict()}), 202
+    except Exception as e:
+        print(f"❌ Error en sync_all: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+
+@sync_blueprint.route("/sync-all/<bulk_id>")
+def get_sync_all(bulk_id):
+    bulk = get_bulk_sync(bulk_id)
+    if bulk is None:
+        return jsonify({"error": "Sync masivo no encontrado"}), 404
+    return jsonify(bulk.to_dict())
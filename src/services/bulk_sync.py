@@ -0,0 +1,188 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services.facebook_service import get_all_tenants
+from services.graph_client import graph_client
+from services.sync_jobs import sync_queue
+from utils.config import SYNC_BULK_WORKERS, SYNC_BULK_PER_TOKEN, SYNC_JOB_RETENTION
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class _TenantScheduler:
+    """
+    Reparte los tenants entre los workers por turnos de access token: cada
+    vez se toma el siguiente token con tenants pendientes y menos de
+    `per_token` syncs en curso, de modo que un token con muchas páginas no
+    acapara el pool ni el límite de uso de la Graph API.
+    """
+
+    def __init__(self, tenants, per_token):
+        self.per_token = per_token
+        self._queues = OrderedDict()
+        for tenant in tenants:
+            self._queues.setdefault(tenant["access_token"], deque()).append(tenant)
+        self._running = {token: 0 for token in self._queues}
+        self._cond = threading.Condition()
+
+    def next(self):
+        """Siguiente tenant a sincronizar, o None cuando ya no quedan."""
+        with self._cond:
+            while True:
+                if not self._queues:
+                    return None
+                for token, queue in self._queues.items():
+                    if self._running[token] < self.per_token:
+                        tenant = queue.popleft()
+                        self._running[token] += 1
+                        if queue:
+                            self._queues.move_to_end(token)
+                        else:
+                            del self._queues[token]
+                        return tenant
+                self._cond.wait()
+
+    def done(self, tenant):
+        with self._cond:
+            self._running[tenant["access_token"]] -= 1
+            self._cond.notify_all()
+
+
+class BulkSync:
+    """
+    Sync de todos los usuarios sobre un pool compartido de `workers` hilos.
+    Cada tenant corre como un SyncJob normal (registrado en `queue`, así que
+    un usuario con un sync ya activo se omite) y al final se reporta, por
+    tenant, duración, peticiones a la Graph API y filas escritas.
+    """
+
+    def __init__(self, tenants, queue=sync_queue, workers=SYNC_BULK_WORKERS,
+                 per_token=SYNC_BULK_PER_TOKEN):
+        self.bulk_id = uuid.uuid4().hex
+        self.tenants = list(tenants)
+        self.queue = queue
+        self.workers = workers
+        self.per_token = per_token
+        self.status = "queued"
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.seconds = None
+        self.reports = {}
+        self._lock = threading.Lock()
+
+    def _sync_tenant(self, tenant):
+        user_id = tenant["user_id"]
+        job, created = self.queue.claim(user_id, tenant=tenant)
+        report = {"user_id": user_id, "page_id": tenant["page_id"], "job_id": job.job_id}
+        if not created:
+            report.update(status="skipped", error="Ya hay un sync en curso para este usuario")
+            return report
+
+        # Las peticiones se cuentan por token: si dos usuarios comparten
+        # token, las de ambos syncs simultáneos se suman en cada uno
+        requests_before = graph_client.requests_for(tenant["access_token"])
+        job.run()
+        data = job.to_dict()
+        report.update(
+            status=job.status,
+            error=job.error,
+            seconds=job.seconds,
+            requests=graph_client.requests_for(tenant["access_token"]) - requests_before,
+            rows=sum(stage["rows"] or 0 for stage in data["stages"]),
+            stages=data["stages"],
+        )
+        return report
+
+    def _worker(self, scheduler):
+        while True:
+            tenant = scheduler.next()
+            if tenant is None:
+                return
+            try:
+                report = self._sync_tenant(tenant)
+            except Exception as e:
+                print(f"❌ Error en sync del usuario {tenant['user_id']}: {str(e)}")
+                report = {"user_id": tenant["user_id"], "page_id": tenant["page_id"],
+                          "status": "failed", "error": str(e)}
+            finally:
+                scheduler.done(tenant)
+            with self._lock:
+                self.reports[tenant["user_id"]] = report
+
+    def run(self):
+        self.status = "running"
+        self.started_at = _now()
+        start = time.perf_counter()
+        scheduler = _TenantScheduler(self.tenants, self.per_token)
+        workers = max(1, min(self.workers, len(self.tenants)))
+        try:
+            with ThreadPoolExecutor(max_workers=workers,
+                                    thread_name_prefix="bulk-sync") as executor:
+                for _ in range(workers):
+                    executor.submit(self._worker, scheduler)
+        finally:
+            self.seconds = round(time.perf_counter() - start, 3)
+            self.finished_at = _now()
+            failed = any(r["status"] == "failed" for r in self.reports.values())
+            self.status = "completed_with_errors" if failed else "succeeded"
+            print(f"🌐 Sync masivo {self.bulk_id}: {len(self.tenants)} usuarios "
+                  f"en {self.seconds}s, Graph API: {graph_client.stats()}")
+
+    def to_dict(self):
+        with self._lock:
+            reports = [self.reports[t["user_id"]] for t in self.tenants
+                       if t["user_id"] in self.reports]
+        return {
+            "bulk_id": self.bulk_id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "seconds": self.seconds,
+            "totals": {
+                "tenants": len(self.tenants),
+                "finished": len(reports),
+                "succeeded": sum(r["status"] == "succeeded" for r in reports),
+                "failed": sum(r["status"] == "failed" for r in reports),
+                "skipped": sum(r["status"] == "skipped" for r in reports),
+                "requests": sum(r.get("requests") or 0 for r in reports),
+                "rows": sum(r.get("rows") or 0 for r in reports),
+            },
+            "tenants": reports,
+        }
+
+
+_bulk_runs = {}
+_bulk_lock = threading.Lock()
+
+
+def start_bulk_sync(wait=False):
+    """
+    Carga todos los tenants en una consulta y lanza un BulkSync: en un hilo
+    aparte, o en el actual con `wait`. Devuelve el BulkSync.
+    """
+    bulk = BulkSync(get_all_tenants())
+    with _bulk_lock:
+        limit = _now().timestamp() - SYNC_JOB_RETENTION
+        for bulk_id in [b for b, run in _bulk_runs.items()
+                        if run.finished_at and run.finished_at.timestamp() < limit]:
+            del _bulk_runs[bulk_id]
+        _bulk_runs[bulk.bulk_id] = bulk
+
+    if wait:
+        bulk.run()
+    else:
+        threading.Thread(target=bulk.run, name=f"bulk-sync-{bulk.bulk_id[:8]}",
+                         daemon=True).start()
+    return bulk
+
+
+def get_bulk_sync(bulk_id):
+    with _bulk_lock:
+        return _bulk_runs.get(bulk_id)
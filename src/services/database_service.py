@@ -1,7 +1,22 @@
+import atexit
+import io
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+
 import psycopg2
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
-from utils.config import USER, PASSWORD, HOST, PORT, DBNAME
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from utils.config import (
+    USER, PASSWORD, HOST, PORT, DBNAME,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_CHECKOUT_TIMEOUT, DB_POOL_HEALTH_CHECK_AFTER,
+    BULK_COPY_THRESHOLD, BULK_VALUES_PAGE_SIZE
+)
 
 
 def get_db_connection():
@@ -19,85 +34,372 @@ def get_db_connection():
         raise
 
 
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe.
+
+    Mantiene entre `minconn` y `maxconn` conexiones abiertas, cierra las que
+    llevan más de `idle_timeout` segundos sin usarse y verifica con un
+    `SELECT 1` las conexiones que estuvieron inactivas más de
+    `health_check_after` segundos antes de entregarlas.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                 checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                 health_check_after=DB_POOL_HEALTH_CHECK_AFTER,
+                 connect=get_db_connection):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamaño de pool inválido")
+
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self._connect = connect
+
+        self._idle = []  # [(conexion, último uso)], la más reciente al final
+        self._size = 0   # conexiones abiertas (libres + en uso)
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            if not conn.closed:
+                conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _prune_idle(self, now):
+        """Cierra conexiones inactivas de más, respetando el mínimo. Requiere el lock."""
+        keep = []
+        expired = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout and self._size - len(expired) > self.minconn:
+                expired.append(conn)
+            else:
+                keep.append((conn, last_used))
+        self._idle = keep
+        self._size -= len(expired)
+        return expired
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("El pool de conexiones está cerrado")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(
+                        "Tiempo de espera agotado al obtener conexión del pool")
+                self._cond.wait(remaining)
+
+        # La conexión (o su creación) se resuelve fuera del lock
+        if conn is not None and self._is_healthy(conn, time.monotonic() - last_used):
+            return conn
+        if conn is not None:
+            self._discard(conn)
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        now = time.monotonic()
+        with self._cond:
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                expired = [conn]
+            else:
+                self._idle.append((conn, now))
+                expired = self._prune_idle(now)
+            self._cond.notify()
+
+        for old in expired:
+            self._discard(old)
+
+    @contextmanager
+    def connection(self):
+        """
+        Entrega una conexión del pool. Hace commit si el bloque termina bien,
+        rollback si lanza una excepción, y la devuelve al pool al salir.
+        """
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle = []
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max": self.maxconn,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                atexit.register(_pool.closeall)
+    return _pool
+
+
+def get_connection():
+    """Context manager con una conexión del pool compartido del proceso."""
+    return get_pool().connection()
+
+
 def execute_query(query, params=None, fetch=False):
-    conn = None
-    try:
-        conn = get_db_connection()
+    with get_connection() as conn:
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         cursor.execute(query, params)
 
         if fetch:
             return cursor.fetchall()
+        return None
+
+
+def iter_query(query, params=None, chunk_size=500):
+    """
+    Ejecuta `query` con un cursor de servidor (con nombre) y entrega las filas
+    una a una, leyendo de a `chunk_size`. La conexión queda tomada del pool
+    hasta que el generador se agota o se cierra.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor(name=f"iter_{uuid.uuid4().hex}",
+                             cursor_factory=RealDictCursor)
+        cursor.itersize = chunk_size
+        try:
+            cursor.execute(query, params)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+
+def _adapt_value(value):
+    if isinstance(value, dict):
+        return Json(value)
+    return value
+
+
+def _scalar_text(value):
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+def _array_literal(values):
+    """
+    Literal de array de Postgres (`{"a","b",NULL}`), como el ARRAY[...]
+    que genera execute_values para listas y tuplas.
+    """
+    items = []
+    for item in values:
+        if item is None:
+            items.append("NULL")
+        elif isinstance(item, (list, tuple)):
+            items.append(_array_literal(item))
         else:
-            conn.commit()
-            return None
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+            text = _scalar_text(item).replace("\\", "\\\\").replace('"', '\\"')
+            items.append(f'"{text}"')
+    return "{" + ",".join(items) + "}"
 
 
-def insert_many(table, data):
-    if not data:
-        return
+def _copy_text_value(value):
+    """Serializa un valor al formato de texto de COPY (NULL = \\N)."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (list, tuple)):
+        value = _array_literal(value)
+    else:
+        value = _scalar_text(value)
+    return (value.replace("\\", "\\\\")
+                 .replace("\t", "\\t")
+                 .replace("\n", "\\n")
+                 .replace("\r", "\\r"))
 
-    conn = None
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
 
-        columns = data[0].keys()
-        query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-            sql.Identifier(table),
-            sql.SQL(', ').join(map(sql.Identifier, columns)),
-            sql.SQL(', ').join(sql.Placeholder() * len(columns))
-        )
+def _copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(v) for v in row))
+        buffer.write("\n")
+    buffer.seek(0)
 
-        cursor.executemany(query, [tuple(item.values()) for item in data])
-        conn.commit()
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        raise e
-    finally:
-        if conn:
-            conn.close()
+    query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    cursor.copy_expert(query.as_string(cursor), buffer)
 
 
-def insert_many_resolving_fk(table, data):
+def _values_rows(cursor, table, columns, rows):
+    query = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns))
+    )
+    execute_values(
+        cursor,
+        query.as_string(cursor),
+        [tuple(_adapt_value(v) for v in row) for row in rows],
+        page_size=BULK_VALUES_PAGE_SIZE
+    )
+
+
+def insert_many(table, data, strategy=None):
+    """
+    Inserta `data` (lista de dicts con las mismas claves) en `table`.
+
+    Con menos de BULK_COPY_THRESHOLD filas usa INSERT multi-fila paginado
+    (`execute_values`); a partir de ahí envía las filas con
+    `COPY ... FROM STDIN` desde un buffer en memoria. `strategy` ("values" o
+    "copy") fuerza una de las dos. Devuelve el número de filas insertadas.
+    """
     if not data:
-        return
+        return 0
 
-    conn = get_db_connection()
-    try:
+    if strategy is None:
+        strategy = "copy" if len(data) >= BULK_COPY_THRESHOLD else "values"
+    if strategy not in ("copy", "values"):
+        raise ValueError(f"Estrategia de inserción desconocida: {strategy}")
+
+    columns = list(data[0].keys())
+    rows = [tuple(item[c] for c in columns) for item in data]
+
+    start = time.perf_counter()
+    with get_connection() as conn:
         cursor = conn.cursor()
+        if strategy == "copy":
+            _copy_rows(cursor, table, columns, rows)
+        else:
+            _values_rows(cursor, table, columns, rows)
+    elapsed = time.perf_counter() - start
+
+    rate = len(rows) / elapsed if elapsed > 0 else float("inf")
+    print(f"📦 insert_many({table}): {len(rows)} filas vía {strategy} "
+          f"en {elapsed:.3f}s ({rate:.0f} filas/s)")
+    return len(rows)
+
+
+def upsert_many(table, rows, conflict_keys, update_columns=None, returning=None):
+    """
+    INSERT ... ON CONFLICT idempotente sobre `table`.
+
+    `conflict_keys` debe corresponder a un índice único. Si `update_columns`
+    está vacío las filas existentes se dejan intactas (DO NOTHING); si no, se
+    actualizan esas columnas con los valores entrantes. Con `returning` se
+    devuelven esas columnas de las filas insertadas/actualizadas; si no, el
+    número de filas enviadas.
+    """
+    if not rows:
+        return [] if returning else 0
+
+    # Postgres rechaza dos filas con la misma clave en un mismo ON CONFLICT
+    # DO UPDATE; se conserva la última aparición.
+    unique_rows = {}
+    for row in rows:
+        unique_rows[tuple(row[k] for k in conflict_keys)] = row
+    rows = list(unique_rows.values())
+
+    columns = list(rows[0].keys())
+    if update_columns:
+        action = sql.SQL("DO UPDATE SET {}").format(sql.SQL(', ').join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c))
+            for c in update_columns
+        ))
+    else:
+        action = sql.SQL("DO NOTHING")
+
+    query = sql.SQL("INSERT INTO {} ({}) VALUES %s ON CONFLICT ({}) {}").format(
+        sql.Identifier(table),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(', ').join(map(sql.Identifier, conflict_keys)),
+        action
+    )
+    if returning:
+        query = sql.SQL("{} RETURNING {}").format(
+            query, sql.SQL(', ').join(map(sql.Identifier, returning)))
+
+    values = [tuple(_adapt_value(row[c]) for c in columns) for row in rows]
+
+    with get_connection() as conn:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        result = execute_values(
+            cursor,
+            query.as_string(cursor),
+            values,
+            page_size=BULK_VALUES_PAGE_SIZE,
+            fetch=bool(returning)
+        )
+
+    return result if returning else len(values)
 
-        for row in data:
-            columns = []
-            values = []
-            placeholders = []
-
-            for k, v in row.items():
-                columns.append(sql.Identifier(k))
-                if isinstance(v, str) and v.startswith("(SELECT"):
-                    placeholders.append(sql.SQL(v))
-                else:
-                    placeholders.append(sql.Placeholder())
-                    values.append(v)
-
-            query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-                sql.Identifier(table),
-                sql.SQL(", ").join(columns),
-                sql.SQL(", ").join(placeholders)
-            )
-            cursor.execute(query, values)
-
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
@@ -1,83 +1,215 @@
 from datetime import datetime
-import requests
-from utils.config import PAGE_ID, ACCESS_TOKEN
-from services.database_service import execute_query, insert_many, insert_many_resolving_fk
+from utils.config import (
+    PAGE_ID, ACCESS_TOKEN, GRAPH_PAGE_LIMIT,
+    GRAPH_EXPAND_POSTS_LIMIT, GRAPH_EXPAND_COMMENTS_LIMIT
+)
+from services.database_service import execute_query, insert_many, upsert_many
+from services.fetch_engine import iter_concurrently
+from services.graph_client import graph_client, GraphAPIError, GRAPH_BATCH_LIMIT
+from services.watermark_service import (
+    SCOPE_PAGE_POSTS, SCOPE_POST_COMMENTS,
+    get_watermark, get_watermarks, save_watermarks, parse_fb_time
+)
 # from services.sentiment_service import analizar_sentimiento
-from services.sentiment import AnalizadorTransformers
+from services.sentiment import get_analizador
+from services.tenant_context import resolve_tenant
 
 
-analizar_sentimiento = AnalizadorTransformers()
+def get_user_access_data(user_id: int):
+    # access_token, page_external_id, page_id (memoizado, ver tenant_context)
+    return resolve_tenant(user_id)
 
 
-def get_user_access_data(user_id: int):
-    result = execute_query(
+def get_all_tenants():
+    """
+    Todos los usuarios con página, en una sola consulta: user_id,
+    access_token, page_external_id y page_id. Como en get_user_access_data,
+    un usuario con varias páginas se sincroniza con la primera.
+    """
+    rows = execute_query(
         """
-        SELECT u.access_token, p.page_external_id, p.page_id
+        SELECT DISTINCT ON (u.user_id)
+               u.user_id, u.access_token, p.page_external_id, p.page_id
         FROM users u
         JOIN pages p ON u.user_id = p.user_id
-        WHERE u.user_id = %s
+        ORDER BY u.user_id, p.page_id
         """,
-        (user_id,),
         fetch=True
     )
-    if not result:
-        raise Exception("Usuario o página no encontrados.")
-    return result[0]  # acceso_token, page_external_id, page_id
+    return rows or []
+
+
+def get_page_posts(page_id: int):
+    return execute_query(
+        "SELECT post_id, post_external_id FROM posts WHERE page_id = %s",
+        (page_id,),
+        fetch=True
+    )
 
 
 def fb_api(path, method="GET", params=None, access_token=None):
-    url = f"https://graph.facebook.com/v18.0{path}"
-    if params is None:
-        params = {}
-    params["access_token"] = access_token
+    return graph_client.request(path, method, params, access_token=access_token)
 
-    try:
-        response = requests.request(method, url, params=params)
-        response.raise_for_status()
-        data = response.json()
 
-        if "error" in data:
-            raise Exception(data["error"].get("message", "Unknown error"))
-        return data
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error en la solicitud HTTP: {str(e)}")
+def iter_batched(items, fetch_chunk, access_token=None):
+    """
+    Divide `items` en grupos de GRAPH_BATCH_LIMIT, ejecuta `fetch_chunk` sobre
+    cada grupo en paralelo (una petición batch por grupo) y entrega
+    `(item, resultado)` en orden. `fetch_chunk` devuelve una lista alineada
+    con el grupo recibido.
+    """
+    items = list(items)
+    chunks = [items[i:i + GRAPH_BATCH_LIMIT]
+              for i in range(0, len(items), GRAPH_BATCH_LIMIT)]
+    for chunk, results in iter_concurrently(chunks, fetch_chunk, access_token):
+        yield from zip(chunk, results)
 
 
-def sync_posts(user_id: int):
-    try:
-        user_data = get_user_access_data(user_id)
-        access_token = user_data["access_token"]
-        page_external_id = user_data["page_external_id"]
+def fb_batch(calls, access_token=None, version="v18.0"):
+    """
+    Envía `calls` (lista de `(path, params)`) como batch de la Graph API y
+    devuelve, alineado con `calls`, el JSON de cada respuesta o un
+    GraphAPIError por cada sub-petición fallida.
+    """
+    return graph_client.batch(calls, access_token=access_token, version=version)
 
-        fb_posts = fb_api(f"/{page_external_id}/posts", "GET", {
-            "fields": "id,message,created_time"
-        }, access_token=access_token).get("data", [])
 
-        existing = execute_query(
-            "SELECT post_external_id FROM posts WHERE page_id = %s",
-            (user_data["page_id"],),
-            fetch=True
-        )
-        existing_ids = [p["post_external_id"] for p in existing]
+# Tipos de reacción pedidos como campos anidados, con la clave que usa
+# post_reactions_by_type_total en post_reactions_summary
+EXPANDED_REACTION_TYPES = {
+    "LIKE": "like", "LOVE": "love", "WOW": "wow",
+    "HAHA": "haha", "SAD": "sorry", "ANGRY": "anger",
+}
 
-        new_posts = [{
-            "post_external_id": post["id"],
-            "page_id": user_data["page_id"],
-            "message": post.get("message"),
-            "created_time": post["created_time"]
-        } for post in fb_posts if post["id"] not in existing_ids]
 
-        if new_posts:
-            insert_many("posts", new_posts)
+def expanded_post_fields(comments_limit=GRAPH_EXPAND_COMMENTS_LIMIT):
+    """
+    Campos de `/{page}/posts` que traen, en la misma respuesta, la primera
+    página de comentarios y el total de cada tipo de reacción de cada post.
+    """
+    fields = [
+        "id", "message", "created_time",
+        f"comments.order(chronological).limit({comments_limit})"
+        "{id,message,created_time,from}",
+    ]
+    for reaction_type in EXPANDED_REACTION_TYPES:
+        fields.append(f"reactions.type({reaction_type}).limit(0)"
+                      f".summary(total_count).as(reactions_{reaction_type.lower()})")
+    return ",".join(fields)
+
+
+def _expanded_reaction_summary(post_id, fb_post, collected_at):
+    rows = []
+    for reaction_type, key in EXPANDED_REACTION_TYPES.items():
+        summary = fb_post.get(f"reactions_{reaction_type.lower()}", {}).get("summary", {})
+        count = summary.get("total_count")
+        if count:
+            rows.append({
+                "post_id": post_id,
+                "reaction_type": key,
+                "reaction_count": count,
+                "collected_at": collected_at
+            })
+    return rows
+
+
+def sync_posts(user_id: int, on_posts=None, expand=False, tenant=None):
+    """
+    Sincroniza los posts de la página desde la marca de agua. Cada página de
+    resultados se guarda en cuanto llega y, si se pasa `on_posts`, se le
+    entregan las filas guardadas (`post_id`, `post_external_id`) para que
+    otras etapas puedan empezar a procesarlas.
+
+    `tenant` (como el de get_user_access_data) evita resolverlo de nuevo
+    cuando ya lo tiene quien llama; igual en el resto de etapas del sync.
+
+    Con `expand` la misma consulta trae los comentarios y el resumen de
+    reacciones de cada post (ver expanded_post_fields), que se guardan en
+    la misma pasada; solo los posts con más comentarios que los incluidos
+    se completan paginando su edge. Devuelve el total de filas escritas.
+    """
+    try:
+        user_data = tenant or get_user_access_data(user_id)
+        access_token = user_data["access_token"]
+        page_external_id = user_data["page_external_id"]
+
+        # Solo se piden posts posteriores a la marca de agua de la página;
+        # sin marca (primer sync) se recorre toda la paginación.
+        params = {"fields": expanded_post_fields() if expand else "id,message,created_time"}
+        mark = get_watermark(SCOPE_PAGE_POSTS, page_external_id)
+        if mark and mark["last_created_time"]:
+            params["since"] = int(mark["last_created_time"].timestamp())
+
+        total = 0
+        last_created_time = None
+        # La página siguiente se pide mientras se guarda la actual
+        pages = graph_client.iter_edge_pages(
+            f"/{page_external_id}/posts", params, access_token=access_token,
+            limit=GRAPH_EXPAND_POSTS_LIMIT if expand else GRAPH_PAGE_LIMIT, prefetch=True)
+        for fb_posts, _ in pages:
+            posts = [{
+                "post_external_id": post["id"],
+                "page_id": user_data["page_id"],
+                "message": post.get("message"),
+                "created_time": post["created_time"]
+            } for post in fb_posts]
+
+            saved = upsert_many("posts", posts, ["post_external_id"],
+                                update_columns=["message"],
+                                returning=["post_id", "post_external_id"])
+            total += len(saved)
+            if expand:
+                total += _store_expanded_edges(saved, fb_posts, access_token)
+            if on_posts:
+                on_posts(saved)
+
+            newest = max(parse_fb_time(p["created_time"]) for p in fb_posts)
+            last_created_time = max(last_created_time or newest, newest)
+
+        if last_created_time:
+            save_watermarks(SCOPE_PAGE_POSTS, [{
+                "external_id": page_external_id,
+                "last_created_time": last_created_time
+            }])
+
+        return total
 
     except Exception as e:
         print(f"Error en sync_posts: {str(e)}")
         raise
 
 
-def sync_reactions(user_id: int):
+def _store_expanded_edges(saved, fb_posts, access_token):
+    """Guarda comentarios y resumen de reacciones anidados en una página de posts."""
+    posts_by_external_id = {p["post_external_id"]: p for p in saved}
+    collected_at = datetime.utcnow()
+    summaries = []
+    marks = []
+    total = 0
+
+    for fb_post in fb_posts:
+        post = posts_by_external_id.get(fb_post["id"])
+        if post is None:
+            continue
+
+        # Si el edge vino truncado (`paging.next`), se sigue paginando solo
+        # para este post
+        count, mark = _store_comment_pages(post, fb_post.get("comments", {}), access_token)
+        total += count
+        if mark:
+            marks.append(mark)
+        summaries.extend(_expanded_reaction_summary(post["post_id"], fb_post, collected_at))
+
+    if summaries:
+        total += insert_many("post_reactions_summary", summaries)
+    if marks:
+        save_watermarks(SCOPE_POST_COMMENTS, marks)
+    return total
+
+
+def sync_reactions(user_id: int, tenant=None):
     try:
-        user_data = get_user_access_data(user_id)
+        user_data = tenant or get_user_access_data(user_id)
         access_token = user_data["access_token"]
 
         posts = execute_query(
@@ -86,50 +218,36 @@ def sync_reactions(user_id: int):
             fetch=True
         )
 
-        for post in posts:
+        def fetch_reactions(post):
+            # Solo la primera página; el resto se recorre al guardar
+            return fb_api(f"/{post['post_external_id']}/reactions", "GET", {
+                "fields": "id,name,type,profile_type",
+                "limit": GRAPH_PAGE_LIMIT
+            }, access_token=access_token)
+
+        total = 0
+
+        # Las primeras páginas se piden en paralelo; la escritura en la
+        # base de datos sigue el orden de los posts en este hilo y cada
+        # página se guarda antes de pedir (o mientras llega) la siguiente.
+        for post, first_page in iter_concurrently(posts, fetch_reactions, access_token):
             post_external_id = post["post_external_id"]
 
-            fb_reactions = fetch_all_fb_data(
-                f"/{post_external_id}/reactions",
-                {"fields": "id,name,type,profile_type"},
-                access_token
-            )
+            for fb_reactions, _ in _iter_pages_from(first_page, access_token):
+                reactions = [{
+                    "post_external_id": post_external_id,
+                    "user_external_id": reaction["id"],
+                    "user_name": reaction.get("name"),
+                    "reaction_type": reaction["type"],
+                    "profile_type": reaction.get("profile_type"),
+                    "created_time": datetime.utcnow()
+                } for reaction in fb_reactions]
 
-            existing_reactions = execute_query(
-                """
-                SELECT user_external_id, reaction_type
-                FROM reactions
-                WHERE post_external_id = %s
-                """,
-                (post_external_id,),
-                fetch=True
-            )
-
-            existing_set = {
-                (r["user_external_id"], r["reaction_type"])
-                for r in existing_reactions
-            }
-
-            new_reactions = []
-            for reaction in fb_reactions:
-                user_external_id = reaction["id"]
-                reaction_type = reaction["type"]
-                key = (user_external_id, reaction_type)
-
-                if key not in existing_set:
-                    new_reactions.append({
-                        "post_external_id": post_external_id,
-                        "user_external_id": user_external_id,
-                        "user_name": reaction.get("name"),
-                        "reaction_type": reaction_type,
-                        "profile_type": reaction.get("profile_type"),
-                        "created_time": datetime.utcnow()
-                    })
+                # Las reacciones ya registradas conservan su created_time original
+                total += upsert_many("reactions", reactions,
+                                     ["post_external_id", "user_external_id", "reaction_type"])
 
-            if new_reactions:
-                print(
-                    f"📥 Insertando {len(new_reactions)} nuevas reacciones para post {post_external_id}")
-                insert_many("reactions", new_reactions)
+        return total
 
     except Exception as e:
         print(f"❌ Error en sync_reactions: {str(e)}")
@@ -137,99 +255,187 @@ def sync_reactions(user_id: int):
 
 
 def fetch_all_fb_data(endpoint, params=None, access_token=None):
-    all_data = []
-    while endpoint:
-        res = fb_api(endpoint, "GET", params, access_token=access_token)
-        data = res.get("data", [])
-        all_data.extend(data)
-        endpoint = res.get("paging", {}).get("next")
-        params = None
-    return all_data
-
+    return list(graph_client.iter_edge(endpoint, params, access_token=access_token))
 
-def sync_comments(user_id: int):
-    try:
-        user_data = get_user_access_data(user_id)
-        access_token = user_data["access_token"]
-        page_external_id = user_data["page_external_id"]
-        page_id = user_data["page_id"]
 
-        # 1. Obtener todos los posts de la página
-        posts = execute_query(
-            """
-            SELECT post_id, post_external_id
-            FROM posts
-            WHERE page_id = %s
-            """,
-            (page_id,),
-            fetch=True
-        )
+def _iter_pages_from(first_page, access_token=None):
+    """
+    Continúa una respuesta paginada ya obtenida (por ejemplo, dentro de un
+    batch): entrega `(items, cursor_after)` de esa página y de las
+    siguientes, una a una, con la siguiente pedida en segundo plano.
+    """
+    data = first_page.get("data", [])
+    if not data:
+        return
+    paging = first_page.get("paging", {})
+    yield data, paging.get("cursors", {}).get("after")
+    if paging.get("next"):
+        yield from graph_client.iter_edge_pages(paging["next"], access_token=access_token,
+                                                prefetch=True)
 
-        for post in posts:
-            post_id = post["post_id"]
-            post_external_id = post["post_external_id"]
 
-            # 2. Obtener comentarios desde la API de Facebook
-            fb_comments = fb_api(f"/{post_external_id}/comments", "GET", {
-                "fields": "id,message,created_time,from"
-            }, access_token=access_token).get("data", [])
+def sync_comments(user_id: int, post_batches=None, tenant=None):
+    """
+    Sincroniza los comentarios de los posts de la página. `post_batches`
+    (iterable de listas de posts con `post_id` y `post_external_id`)
+    permite procesar posts a medida que otra etapa los descubre; por
+    defecto se toman todos los posts guardados de la página.
+    """
+    try:
+        user_data = tenant or get_user_access_data(user_id)
+        access_token = user_data["access_token"]
 
-            # 3. Consultar comentarios ya existentes en la base de datos
-            existing_comments = execute_query(
+        if post_batches is None:
+            # 1. Obtener todos los posts de la página
+            post_batches = [execute_query(
                 """
-                SELECT comment_external_id FROM comments
-                WHERE post_id = %s
+                SELECT post_id, post_external_id
+                FROM posts
+                WHERE page_id = %s
                 """,
-                (post_id,),
+                (user_data["page_id"],),
                 fetch=True
-            )
-            existing_ids = {c["comment_external_id"]
-                            for c in existing_comments}
-
-            # 4. Preparar nuevos comentarios para insertar
-            new_comments = []
-            for comment in fb_comments:
-                external_id = comment["id"]
-                if external_id not in existing_ids:
-                    texto = comment.get("message", "")
-                    sentiment = "neutral"
-
-                    if texto.strip():
-                        try:
-                            sentiment = analizar_sentimiento.analizar(texto)[
-                                "sentimiento"]
-                        except Exception as e:
-                            print(f"⚠️ Error al analizar sentimiento: {e}")
-                            sentiment = "error"
-
-                    new_comments.append({
-                        "comment_external_id": external_id,
-                        "post_id": post_id,
-                        "user_external_id": comment.get("from", {}).get("id"),
-                        "user_name": comment.get("from", {}).get("name"),
-                        "message": texto,
-                        "created_time": comment["created_time"],
-                        "sentiment": sentiment,
-                    })
+            )]
 
-            # 5. Insertar en la base de datos
-            if new_comments:
-                print(
-                    f"🟢 Insertando {len(new_comments)} comentarios nuevos para post {post_external_id}")
-                insert_many("comments", new_comments)
+        total = 0
+        for posts in post_batches:
+            total += _sync_comments_for_posts(posts, access_token)
+        return total
 
     except Exception as e:
         print(f"❌ Error en sync_comments: {str(e)}")
         raise
 
 
-def fetch_page_metric(user_id: int, metric_name: str):
+def _sync_comments_for_posts(posts, access_token):
+    # Cursor `after` guardado por post: la API solo devuelve comentarios
+    # posteriores al último leído en el sync anterior
+    marks = get_watermarks(SCOPE_POST_COMMENTS,
+                           [p["post_external_id"] for p in posts])
+    new_marks = []
+    total = 0
+
+    # 2. Obtener comentarios desde la API de Facebook: un batch por cada
+    #    GRAPH_BATCH_LIMIT posts, con los batches en paralelo
+    def comments_params(post):
+        params = {"fields": "id,message,created_time,from",
+                  "order": "chronological", "limit": GRAPH_PAGE_LIMIT}
+        mark = marks.get(post["post_external_id"])
+        if mark and mark["cursor"]:
+            params["after"] = mark["cursor"]
+        return params
+
+    def fetch_comments(chunk):
+        # Solo la primera página de cada post; las siguientes se recorren
+        # página a página al guardar, sin acumular todo el post en memoria
+        responses = fb_batch([
+            (f"/{post['post_external_id']}/comments", comments_params(post))
+            for post in chunk
+        ], access_token=access_token)
+
+        for response in responses:
+            if isinstance(response, GraphAPIError):
+                raise response
+        return responses
+
+    for post, first_page in iter_batched(posts, fetch_comments, access_token):
+        count, mark = _store_comment_pages(post, first_page, access_token)
+        total += count
+        if mark:
+            new_marks.append(mark)
+
+    # 6. Avanzar las marcas de agua una vez guardados los comentarios
+    if new_marks:
+        save_watermarks(SCOPE_POST_COMMENTS, new_marks)
+
+    return total
+
+
+def _store_comment_pages(post, first_page, access_token=None):
+    """
+    Guarda los comentarios de un post a partir de su primera página (de un
+    batch o de un campo anidado), siguiendo `paging.next`. Devuelve
+    `(filas, marca_de_agua)`; la marca es None si no llegó ningún comentario.
+    """
+    total = 0
+    last_created_time = None
+    cursor = None
+
+    for fb_comments, page_cursor in _iter_pages_from(first_page, access_token):
+        total += _store_comments_page(post, fb_comments)
+        newest = max(parse_fb_time(c["created_time"]) for c in fb_comments)
+        last_created_time = max(last_created_time or newest, newest)
+        cursor = page_cursor or cursor
+
+    if not last_created_time:
+        return total, None
+    return total, {
+        "external_id": post["post_external_id"],
+        "last_created_time": last_created_time,
+        "cursor": cursor
+    }
+
+
+def _store_comments_page(post, fb_comments):
+    """Analiza y guarda una página de comentarios de un post."""
+    post_id = post["post_id"]
+    post_external_id = post["post_external_id"]
+
+    # 3. Entre los comentarios recibidos, cuáles ya están guardados
+    #    (solo para no repetir el análisis de sentimiento)
+    existing_comments = execute_query(
+        """
+        SELECT comment_external_id FROM comments
+        WHERE comment_external_id = ANY(%s)
+        """,
+        ([c["id"] for c in fb_comments],),
+        fetch=True
+    )
+    existing_ids = {c["comment_external_id"]
+                    for c in existing_comments}
+
+    # 4. Analizar en lote solo los comentarios nuevos
+    nuevos = [c for c in fb_comments if c["id"] not in existing_ids]
+    sentiments = {}
+    try:
+        resultados = get_analizador().analizar_lote(
+            [c.get("message", "") for c in nuevos])
+        for comment, resultado in zip(nuevos, resultados):
+            sentiments[comment["id"]] = resultado["sentimiento"]
+    except Exception as e:
+        print(f"⚠️ Error al analizar sentimiento: {e}")
+        sentiments = {c["id"]: "error" for c in nuevos}
+
+    comments = []
+    for comment in fb_comments:
+        comments.append({
+            "comment_external_id": comment["id"],
+            "post_id": post_id,
+            "user_external_id": comment.get("from", {}).get("id"),
+            "user_name": comment.get("from", {}).get("name"),
+            "message": comment.get("message", ""),
+            "created_time": comment["created_time"],
+            # None para los existentes: el upsert no toca su sentimiento
+            "sentiment": sentiments.get(comment["id"]),
+        })
+
+    # 5. Upsert: los nuevos se insertan, los existentes solo
+    #    actualizan el texto (el sentimiento guardado no se toca)
+    new_count = len(fb_comments) - len(existing_ids)
+    if new_count:
+        print(
+            f"🟢 Insertando {new_count} comentarios nuevos para post {post_external_id}")
+    return upsert_many("comments", comments, ["comment_external_id"],
+                       update_columns=["message", "user_name"])
+
+
+def fetch_page_metric(user_id: int, metric_name: str, tenant=None):
     """
     Obtiene una métrica específica de página desde la API de Facebook
     para el usuario indicado. No depende de ninguna otra función auxiliar.
     """
     # Obtener access_token y page_external_id desde la base de datos
-    user_data = get_user_access_data(user_id)
+    user_data = tenant or get_user_access_data(user_id)
     access_token = user_data["access_token"]
     page_external_id = user_data["page_external_id"]
 
@@ -237,65 +443,97 @@ def fetch_page_metric(user_id: int, metric_name: str):
         raise ValueError(
             "Faltan datos del usuario: access_token o page_external_id")
 
-    # Construir URL y parámetros
-    url = f"https://graph.facebook.com/v19.0/{page_external_id}/insights"
-    params = {
+    data = graph_client.request(f"/{page_external_id}/insights", "GET", {
         "metric": metric_name,
-        "period": "day",
-        "access_token": access_token
-    }
+        "period": "day"
+    }, access_token=access_token, version="v19.0")
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+    return data.get("data", [])
 
-        if "error" in data:
-            raise Exception(data["error"].get(
-                "message", "Error desconocido en la API de Facebook"))
 
-        return data.get("data", [])
+def fetch_page_metrics(user_id: int, metric_names, tenant=None):
+    """
+    Versión en batch de fetch_page_metric: pide todas las métricas en una
+    sola petición y devuelve, alineada con `metric_names`, la lista `data`
+    de cada una o un GraphAPIError si esa métrica falló.
+    """
+    user_data = tenant or get_user_access_data(user_id)
+    access_token = user_data["access_token"]
+    page_external_id = user_data["page_external_id"]
 
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"❌ Error en la solicitud HTTP: {e}")
+    if not access_token or not page_external_id:
+        raise ValueError(
+            "Faltan datos del usuario: access_token o page_external_id")
 
+    responses = fb_batch([
+        (f"/{page_external_id}/insights", {"metric": name, "period": "day"})
+        for name in metric_names
+    ], access_token=access_token, version="v19.0")
 
-def sync_post_reactions_summary(user_id: int):
+    return [r if isinstance(r, GraphAPIError) else r.get("data", [])
+            for r in responses]
+
+
+def sync_post_reactions_summary(user_id: int, post_batches=None, tenant=None):
     """
     Sincroniza el resumen de reacciones por tipo (like, love, haha, etc.)
-    para todos los posts de la página del usuario.
+    para todos los posts de la página del usuario. Como en sync_comments,
+    `post_batches` permite recibir los posts a medida que se descubren.
     """
-    user_data = get_user_access_data(user_id)
+    user_data = tenant or get_user_access_data(user_id)
     page_id = user_data["page_id"]
 
-    # Obtener todos los posts de esta página
-    posts = execute_query(
-        "SELECT post_id, post_external_id FROM posts WHERE page_id = %s",
-        (page_id,),
-        fetch=True
-    )
+    if post_batches is None:
+        # Obtener todos los posts de esta página
+        posts = execute_query(
+            "SELECT post_id, post_external_id FROM posts WHERE page_id = %s",
+            (page_id,),
+            fetch=True
+        )
+
+        if not posts:
+            print("⚠️ No hay posts registrados para esta página.")
+            return 0
+        post_batches = [posts]
+
+    total = 0
+    for posts in post_batches:
+        total += _sync_reactions_summary_for_posts(posts, user_data["access_token"])
+    return total
 
-    if not posts:
-        print("⚠️ No hay posts registrados para esta página.")
-        return
 
-    for post in posts:
+def _sync_reactions_summary_for_posts(posts, access_token):
+    def fetch_post_insights(chunk):
+        # Los errores de un post (o de un batch) no detienen el resto:
+        # se registran y esos posts se omiten
+        try:
+            responses = fb_batch([
+                (f"/{post['post_external_id']}/insights",
+                 {"metric": "post_reactions_by_type_total", "period": "lifetime"})
+                for post in chunk
+            ], access_token=access_token, version="v19.0")
+        except Exception as e:
+            print(f"❌ Error al obtener insights de {len(chunk)} posts: {e}")
+            return [None] * len(chunk)
+
+        results = []
+        for post, response in zip(chunk, responses):
+            if isinstance(response, GraphAPIError):
+                print(f"❌ Error al procesar post {post['post_external_id']}: {response}")
+                results.append(None)
+            else:
+                results.append(response.get("data", []))
+        return results
+
+    total = 0
+    for post, metrics in iter_batched(posts, fetch_post_insights, access_token):
         post_id = post["post_id"]
         post_external_id = post["post_external_id"]
 
-        try:
-            # Obtener métricas del post desde la API
-            url = f"https://graph.facebook.com/v19.0/{post_external_id}/insights"
-            params = {
-                "metric": "post_reactions_by_type_total",
-                "period": "lifetime",
-                "access_token": user_data["access_token"]
-            }
-
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            metrics = response.json().get("data", [])
+        if metrics is None:
+            continue
 
+        try:
             new_summaries = []
 
             for item in metrics:
@@ -319,13 +557,15 @@ def sync_post_reactions_summary(user_id: int):
                     })
 
             if new_summaries:
-                insert_many("post_reactions_summary", new_summaries)
+                total += insert_many("post_reactions_summary", new_summaries)
                 print(
                     f"✅ Reacciones resumidas insertadas para post {post_external_id}")
 
         except Exception as e:
             print(f"❌ Error al procesar post {post_external_id}: {e}")
 
+    return total
+
 
 METRICAS_PAGE = [
     "page_impressions",
@@ -334,17 +574,27 @@ METRICAS_PAGE = [
 ]
 
 
-def sync_all_page_metrics(user_id: int):
+def sync_all_page_metrics(user_id: int, tenant=None):
     """
     Obtiene todas las métricas definidas para una página desde la API de Facebook
     y las guarda en la tabla `insights`.
     """
-    user_data = get_user_access_data(user_id)
+    user_data = tenant or get_user_access_data(user_id)
     page_id = user_data["page_id"]
 
-    for metric_name in METRICAS_PAGE:
+    # Todas las métricas viajan en una sola petición batch. Si falla el
+    # batch completo, se registra como fallo de cada métrica y se sigue,
+    # igual que cuando falla una sola
+    try:
+        metrics_data = fetch_page_metrics(user_id, METRICAS_PAGE, tenant=user_data)
+    except Exception as e:
+        metrics_data = [e] * len(METRICAS_PAGE)
+
+    total = 0
+    for metric_name, metric_data in zip(METRICAS_PAGE, metrics_data):
         try:
-            metric_data = fetch_page_metric(user_id, metric_name)
+            if isinstance(metric_data, Exception):
+                raise metric_data
             rows_to_insert = []
 
             for metric in metric_data:
@@ -365,9 +615,11 @@ def sync_all_page_metrics(user_id: int):
                     })
 
             if rows_to_insert:
-                insert_many("insights", rows_to_insert)
+                total += insert_many("insights", rows_to_insert)
                 print(
                     f"✅ Métrica {metric_name} guardada con {len(rows_to_insert)} registros")
 
         except Exception as e:
             print(f"❌ Error al sincronizar {metric_name}: {e}")
+
+    return total
@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import GRAPH_MAX_WORKERS, GRAPH_MAX_CONCURRENCY_PER_TOKEN
+
+
+# Un semáforo por access token, compartido por todos los syncs del proceso,
+# para no superar GRAPH_MAX_CONCURRENCY_PER_TOKEN peticiones simultáneas
+# con el mismo token.
+_token_semaphores = {}
+_token_lock = threading.Lock()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def token_semaphore(access_token):
+    with _token_lock:
+        semaphore = _token_semaphores.get(access_token)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(
+                GRAPH_MAX_CONCURRENCY_PER_TOKEN)
+            _token_semaphores[access_token] = semaphore
+        return semaphore
+
+
+def iter_concurrently(items, fetch, access_token=None, max_workers=GRAPH_MAX_WORKERS):
+    """
+    Ejecuta `fetch(item)` para cada item en un pool de hilos y va entregando
+    `(item, resultado)` en el mismo orden que `items`.
+
+    Como mucho GRAPH_MAX_CONCURRENCY_PER_TOKEN llamadas con el mismo token
+    corren a la vez. Si una llamada lanza una excepción, las que aún no
+    empezaron se cancelan y la excepción se relanza al consumidor.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    semaphore = token_semaphore(access_token)
+    stop = threading.Event()
+    errors = []
+    errors_lock = threading.Lock()
+
+    def run(item):
+        with semaphore:
+            if stop.is_set():
+                raise _Cancelled()
+            return fetch(item)
+
+    def on_done(future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None and not isinstance(error, _Cancelled):
+            with errors_lock:
+                errors.append(error)
+            stop.set()
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(items)))
+    try:
+        futures = []
+        for item in items:
+            future = executor.submit(run, item)
+            future.add_done_callback(on_done)
+            futures.append(future)
+
+        for item, future in zip(items, futures):
+            if errors:
+                raise errors[0]
+            try:
+                result = future.result()
+            except _Cancelled:
+                raise errors[0]
+            yield item, result
+    finally:
+        stop.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def fetch_concurrently(items, fetch, access_token=None, max_workers=GRAPH_MAX_WORKERS):
+    """Versión en lista de iter_concurrently: devuelve los resultados en orden."""
+    return [result for _, result in
+            iter_concurrently(items, fetch, access_token, max_workers)]
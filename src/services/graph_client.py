@@ -0,0 +1,308 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from utils.config import (
+    GRAPH_HTTP_POOL_SIZE, GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT, GRAPH_PAGE_LIMIT,
+    GRAPH_MAX_RETRIES
+)
+from services.rate_governor import RateGovernor, is_throttle_error
+
+
+GRAPH_BASE_URL = "https://graph.facebook.com"
+GRAPH_BATCH_LIMIT = 50  # máximo de sub-peticiones por batch de la Graph API
+
+
+class GraphAPIError(Exception):
+    """Error devuelto por la Graph API para una petición (o sub-petición de un batch)."""
+
+    def __init__(self, message, code=None, status=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+_VERSION_RE = re.compile(r"^v\d+\.\d+$")
+
+
+def _page_key(path):
+    """
+    Página a la que se imputa una petición, deducida del primer segmento
+    del path: los ids de posts y comentarios tienen la forma
+    `{page_id}_{post_id}`, así que se toma lo anterior al primer `_`.
+    """
+    segments = [s for s in urlparse(path).path.split("/") if s]
+    if segments and _VERSION_RE.match(segments[0]):
+        segments = segments[1:]
+    if not segments:
+        return None
+    return segments[0].split("_")[0]
+
+
+def _is_retryable(error):
+    return is_throttle_error(error.code) or (error.status or 0) >= 500
+
+
+class GraphClient:
+    """
+    Cliente compartido de la Graph API.
+
+    Usa una única `requests.Session` con un pool de conexiones keep-alive
+    (HTTPAdapter), de modo que las peticiones reutilizan conexiones TLS ya
+    abiertas en lugar de hacer un handshake nuevo cada vez.
+
+    Todas las peticiones pasan por un RateGovernor (un token bucket por
+    token y por página) que se ajusta con las cabeceras de uso de Facebook;
+    las respuestas de throttling y los 5xx se reintentan con backoff.
+    """
+
+    def __init__(self, version="v18.0", pool_size=GRAPH_HTTP_POOL_SIZE,
+                 timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT)):
+        self.version = version
+        self.timeout = timeout
+
+        self._adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+        self.governor = RateGovernor()
+        self._requests = 0
+        self._requests_by_token = {}
+        self._lock = threading.Lock()
+
+    def _url(self, path, version=None):
+        # Las URLs de paginación (`paging.next`) ya vienen completas
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{GRAPH_BASE_URL}/{version or self.version}{path}"
+
+    def _send_once(self, method, url, access_token, page_key, cost=1, **kwargs):
+        wait = self.governor.acquire(access_token, page_key, cost)
+        if wait is not None:
+            # No es reintentable: el job falla a la vista en lugar de
+            # quedarse esperando a que Facebook devuelva el acceso
+            raise GraphAPIError(
+                f"Límite de uso de la Graph API alcanzado; acceso recuperable "
+                f"en {round(wait)}s")
+        with self._lock:
+            self._requests += 1
+            self._requests_by_token[access_token] = self._requests_by_token.get(access_token, 0) + 1
+        try:
+            response = self.session.request(
+                method, url, timeout=self.timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"Error en la solicitud HTTP: {str(e)}")
+
+        self.governor.observe(access_token, page_key, response.headers)
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+
+        if isinstance(data, dict) and "error" in data:
+            error = data["error"]
+            raise GraphAPIError(error.get("message", "Unknown error"),
+                                code=error.get("code"),
+                                status=response.status_code)
+        if response.status_code >= 400:
+            raise GraphAPIError(f"Error HTTP {response.status_code} en {urlparse(url).path}",
+                                status=response.status_code)
+        return data
+
+    def _send(self, method, url, access_token=None, page_key=None, cost=1, **kwargs):
+        """
+        Envía la petición respetando el ritmo del governor y la reintenta,
+        con backoff exponencial y jitter, si Facebook responde con un error
+        de throttling (4/17/32/613, 80001-80014) o un 5xx.
+        """
+        attempt = 0
+        while True:
+            try:
+                return self._send_once(method, url, access_token, page_key, cost, **kwargs)
+            except GraphAPIError as e:
+                if not _is_retryable(e) or attempt >= GRAPH_MAX_RETRIES:
+                    raise
+                delay = self.governor.throttled(
+                    access_token, page_key, attempt,
+                    code=e.code if is_throttle_error(e.code) else None)
+                print(f"⏳ Graph API: {e} (código {e.code}), reintento "
+                      f"{attempt + 1}/{GRAPH_MAX_RETRIES} en {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+    def request(self, path, method="GET", params=None, access_token=None, version=None):
+        url = self._url(path, version)
+        params = dict(params or {})
+        # `paging.next` ya incluye el token en la query string
+        if "access_token=" not in url:
+            params["access_token"] = access_token
+        else:
+            access_token = parse_qs(urlparse(url).query).get("access_token", [access_token])[0]
+        return self._send(method, url, access_token=access_token,
+                          page_key=_page_key(path), params=params)
+
+    def iter_edge_pages(self, path, params=None, access_token=None, limit=GRAPH_PAGE_LIMIT,
+                        after=None, prefetch=False, version=None):
+        """
+        Recorre un edge paginado (`/{id}/comments`, `/{id}/posts`, ...) y
+        entrega `(items, cursor_after)` por cada página, siguiendo
+        `paging.next` hasta el final.
+
+        `path` puede ser también una URL `paging.next` ya completa. `after`
+        retoma desde un cursor guardado. Con `prefetch` la página siguiente
+        se pide en segundo plano mientras el consumidor procesa la actual.
+        Solo se mantiene en memoria una página (dos con prefetch).
+        """
+        params = dict(params or {})
+        if limit and "limit" not in params and "limit=" not in path:
+            params["limit"] = limit
+        if after:
+            params["after"] = after
+
+        def fetch(url, page_params=None):
+            return self.request(url, "GET", page_params, access_token=access_token,
+                                version=version)
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = fetch(path, params)
+            while True:
+                data = page.get("data", [])
+                paging = page.get("paging", {})
+                next_url = paging.get("next") if data else None
+
+                upcoming = executor.submit(fetch, next_url) if executor and next_url else None
+                if data:
+                    yield data, paging.get("cursors", {}).get("after")
+                if not next_url:
+                    return
+                page = upcoming.result() if upcoming else fetch(next_url)
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_edge(self, path, params=None, access_token=None, **kwargs):
+        """Como iter_edge_pages, pero entrega los items uno a uno."""
+        for items, _ in self.iter_edge_pages(path, params, access_token, **kwargs):
+            yield from items
+
+    def batch(self, calls, access_token=None, version=None):
+        """
+        Envía varias peticiones GET como batch de la Graph API.
+
+        `calls` es una lista de `(path, params)`. Se agrupan en sobres de
+        hasta GRAPH_BATCH_LIMIT sub-peticiones y se devuelve una lista
+        alineada con `calls`: el JSON de cada respuesta, o un GraphAPIError
+        si esa sub-petición falló. Un fallo del batch completo se lanza.
+
+        Las sub-peticiones que fallan por throttling o 5xx se reenvían en un
+        batch posterior, con backoff, hasta GRAPH_MAX_RETRIES veces.
+        """
+        version = version or self.version
+        calls = list(calls)
+        results = []
+
+        for chunk in _chunks(calls, GRAPH_BATCH_LIMIT):
+            page_key = _page_key(chunk[0][0])
+            chunk_results = [None] * len(chunk)
+            pending = list(range(len(chunk)))
+            attempt = 0
+
+            while pending:
+                batch = []
+                for i in pending:
+                    path, params = chunk[i]
+                    relative_url = f"{version}{path}"
+                    if params:
+                        relative_url += "?" + urlencode(params)
+                    batch.append({"method": "GET", "relative_url": relative_url})
+
+                # Facebook cuenta cada sub-petición contra los límites de uso
+                data = self._send("POST", GRAPH_BASE_URL, access_token=access_token,
+                                  page_key=page_key, cost=len(batch), data={
+                                      "access_token": access_token,
+                                      "batch": json.dumps(batch),
+                                      "include_headers": "false"
+                                  })
+
+                retry = []
+                for i, item in zip(pending, data):
+                    result = _parse_batch_item(chunk[i][0], item)
+                    chunk_results[i] = result
+                    if isinstance(result, GraphAPIError) and _is_retryable(result):
+                        retry.append(i)
+
+                if not retry or attempt >= GRAPH_MAX_RETRIES:
+                    break
+                throttle_codes = [chunk_results[i].code for i in retry
+                                  if is_throttle_error(chunk_results[i].code)]
+                delay = self.governor.throttled(
+                    access_token, page_key, attempt,
+                    code=throttle_codes[0] if throttle_codes else None)
+                print(f"⏳ Graph API: {len(retry)} sub-peticiones del batch limitadas, "
+                      f"reintento {attempt + 1}/{GRAPH_MAX_RETRIES} en {delay:.1f}s")
+                time.sleep(delay)
+                pending = retry
+                attempt += 1
+
+            results.extend(chunk_results)
+
+        return results
+
+    def requests_for(self, access_token):
+        """Peticiones enviadas con `access_token` desde que arrancó el proceso."""
+        with self._lock:
+            return self._requests_by_token.get(access_token, 0)
+
+    def stats(self):
+        """Peticiones enviadas, conexiones abiertas/reutilizadas por el pool y estado del governor."""
+        opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+
+        with self._lock:
+            sent = self._requests
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(sent - opened, 0),
+            "rate": self.governor.stats(),
+        }
+
+
+def _parse_batch_item(path, item):
+    # Facebook devuelve null para sub-peticiones que no alcanzó a ejecutar
+    if item is None:
+        return GraphAPIError(f"Sin respuesta en el batch para {path}")
+
+    try:
+        body = json.loads(item.get("body") or "{}")
+    except ValueError:
+        body = {}
+
+    if item.get("code") != 200 or "error" in body:
+        error = body.get("error", {})
+        return GraphAPIError(
+            error.get("message", f"Error HTTP {item.get('code')} en {path}"),
+            code=error.get("code"),
+            status=item.get("code")
+        )
+    return body
+
+
+graph_client = GraphClient()
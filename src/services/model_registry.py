@@ -0,0 +1,66 @@
+import resource
+import threading
+import time
+from services.sentiment_backends import cargar_pipeline
+
+
+# Registro de pipelines del proceso: cada (tarea, modelo, backend) se carga una sola
+# vez, la primera vez que se pide, y se comparte entre blueprints y servicios.
+_pipelines = {}
+_load_stats = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _model_bytes(pipe):
+    try:
+        return sum(p.numel() * p.element_size() for p in pipe.model.parameters())
+    except Exception:
+        return None
+
+
+def _max_rss_bytes():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_pipeline(task: str, model: str, backend: str = "torch"):
+    """Devuelve el pipeline de `model` en `backend`, cargándolo solo la primera vez."""
+    key = (task, model, backend)
+    pipe = _pipelines.get(key)
+    if pipe is not None:
+        return pipe
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+
+    with lock:
+        pipe = _pipelines.get(key)
+        if pipe is not None:
+            return pipe
+
+        rss_before = _max_rss_bytes()
+        start = time.perf_counter()
+        pipe = cargar_pipeline(task, model, backend)
+        elapsed = time.perf_counter() - start
+
+        _load_stats[key] = {
+            "task": task,
+            "model": model,
+            "backend": backend,
+            "load_seconds": round(elapsed, 3),
+            "parameter_bytes": _model_bytes(pipe),
+            "rss_growth_bytes": max(_max_rss_bytes() - rss_before, 0),
+        }
+        _pipelines[key] = pipe
+        print(f"🧠 Modelo {model} ({backend}) cargado en {elapsed:.2f}s")
+        return pipe
+
+
+def is_loaded(task: str, model: str, backend: str = "torch") -> bool:
+    return (task, model, backend) in _pipelines
+
+
+def stats():
+    """Tiempo de carga y memoria de cada pipeline cargado."""
+    return list(_load_stats.values())
@@ -0,0 +1,245 @@
+import json
+import random
+import threading
+import time
+from utils.config import (
+    GRAPH_RATE_PER_TOKEN, GRAPH_RATE_PER_PAGE, GRAPH_RATE_BURST,
+    GRAPH_USAGE_SLOWDOWN, GRAPH_BACKOFF_BASE, GRAPH_BACKOFF_MAX
+)
+
+
+# Códigos de error de la Graph API que indican límite de uso alcanzado:
+# 4 (app), 17 (usuario), 32 (página), 613 (llamadas por segundo) y el rango
+# 80001-80014 de los límites Business Use Case.
+THROTTLE_CODES = {4, 17, 32, 613} | set(range(80001, 80015))
+
+# Fracción mínima de la tasa base a la que se baja al acercarse al límite
+MIN_RATE_FACTOR = 0.05
+
+
+def is_throttle_error(code):
+    return code in THROTTLE_CODES
+
+
+def backoff_delay(attempt, base=GRAPH_BACKOFF_BASE, cap=GRAPH_BACKOFF_MAX):
+    """Backoff exponencial con jitter completo: uniforme en [0, base·2^intento]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _usage_percent(usage):
+    """Mayor porcentaje entre call_count, total_time y total_cputime."""
+    if not isinstance(usage, dict):
+        return 0
+    return max((usage.get(k) or 0 for k in ("call_count", "total_time", "total_cputime")),
+               default=0)
+
+
+def parse_usage_headers(headers):
+    """
+    Interpreta X-App-Usage, X-Page-Usage y X-Business-Use-Case-Usage.
+
+    Devuelve `(uso_token, uso_pagina, espera)`: los porcentajes de uso
+    (0-100) que afectan al token y a la página, y los segundos que
+    Facebook indica esperar antes de recuperar el acceso (0 si ninguno).
+    """
+    def load(name):
+        raw = headers.get(name)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    token_usage = _usage_percent(load("X-App-Usage"))
+    page_usage = _usage_percent(load("X-Page-Usage"))
+    wait = 0
+
+    # {"<business_id>": [{"type": "pages", "call_count": 12, ...,
+    #                     "estimated_time_to_regain_access": 0}]}
+    buc = load("X-Business-Use-Case-Usage")
+    if isinstance(buc, dict):
+        for entries in buc.values():
+            for entry in entries or []:
+                page_usage = max(page_usage, _usage_percent(entry))
+                # Viene en minutos
+                wait = max(wait, (entry.get("estimated_time_to_regain_access") or 0) * 60)
+
+    return token_usage, page_usage, wait
+
+
+class TokenBucket:
+    """
+    Token bucket con tasa ajustable: `acquire(n)` bloquea hasta que hay `n`
+    tokens disponibles. `pause(segundos)` retiene todos los tokens hasta
+    entonces (límite ya alcanzado).
+    """
+
+    def __init__(self, rate, capacity=GRAPH_RATE_BURST):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.paused_until = 0
+        self.usage = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, n=1, max_wait=None):
+        """
+        Toma `n` tokens y devuelve None. Si el bucket está pausado por más
+        de `max_wait` segundos no espera: devuelve los segundos restantes.
+        """
+        # Un costo mayor que la capacidad no cabría nunca en el bucket: se
+        # espera a tenerlo lleno y el resto queda como deuda (saldo negativo)
+        needed = min(n, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                    if max_wait is not None and wait > max_wait:
+                        return wait
+                elif self.tokens >= needed:
+                    self.tokens -= n
+                    return
+                else:
+                    wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def paused_for(self):
+        """Segundos que faltan para que termine la pausa (0 si no hay)."""
+        with self._lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+    def refund(self, n):
+        """Devuelve `n` tokens tomados para una petición que no se envió."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + n)
+
+    def set_usage(self, percent):
+        """
+        Ajusta la tasa según el uso informado por Facebook: a tasa completa
+        por debajo de GRAPH_USAGE_SLOWDOWN y bajando linealmente hasta
+        MIN_RATE_FACTOR al acercarse al 100%.
+        """
+        if percent <= GRAPH_USAGE_SLOWDOWN:
+            factor = 1.0
+        else:
+            factor = (100 - percent) / (100 - GRAPH_USAGE_SLOWDOWN)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.usage = percent
+            self.rate = self.base_rate * max(MIN_RATE_FACTOR, min(1.0, factor))
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class RateGovernor:
+    """
+    Regula el ritmo de peticiones a la Graph API con un token bucket por
+    access token y otro por página, compartidos por todos los hilos del
+    proceso. Las cabeceras de uso de cada respuesta ajustan la tasa antes
+    de llegar al límite; un error de throttling pausa el bucket afectado.
+    """
+
+    def __init__(self, token_rate=GRAPH_RATE_PER_TOKEN, page_rate=GRAPH_RATE_PER_PAGE):
+        self.token_rate = token_rate
+        self.page_rate = page_rate
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._throttled = 0
+        self._retries = 0
+
+    def _bucket(self, kind, key):
+        with self._lock:
+            bucket = self._buckets.get((kind, key))
+            if bucket is None:
+                rate = self.token_rate if kind == "token" else self.page_rate
+                bucket = TokenBucket(rate)
+                self._buckets[(kind, key)] = bucket
+            return bucket
+
+    def _buckets_for(self, access_token, page_key):
+        buckets = [self._bucket("token", access_token)]
+        if page_key:
+            buckets.append(self._bucket("page", page_key))
+        return buckets
+
+    def acquire(self, access_token, page_key=None, cost=1, max_wait=GRAPH_BACKOFF_MAX):
+        """
+        Espera turno en los buckets del token y de la página. `cost` es el
+        número de llamadas que cuenta Facebook (sub-peticiones de un batch).
+
+        Si Facebook pidió esperar más de `max_wait` segundos (por ejemplo,
+        estimated_time_to_regain_access de varios minutos) no se bloquea:
+        devuelve los segundos restantes para que quien llama falle.
+        """
+        buckets = self._buckets_for(access_token, page_key)
+        # Antes de cobrar nada se mira si algún bucket está pausado de más,
+        # para no gastar tokens del token en una petición que no saldrá
+        for bucket in buckets:
+            wait = bucket.paused_for()
+            if wait > max_wait:
+                return wait
+
+        taken = []
+        for bucket in buckets:
+            wait = bucket.acquire(cost, max_wait)
+            if wait is not None:
+                # La pausa empezó mientras se esperaba turno en otro bucket
+                for earlier in taken:
+                    earlier.refund(cost)
+                return wait
+            taken.append(bucket)
+        return None
+
+    def observe(self, access_token, page_key, headers):
+        token_usage, page_usage, wait = parse_usage_headers(headers)
+        self._bucket("token", access_token).set_usage(token_usage)
+        if page_key:
+            page_bucket = self._bucket("page", page_key)
+            page_bucket.set_usage(page_usage)
+            if wait:
+                page_bucket.pause(wait)
+
+    def throttled(self, access_token, page_key, attempt, code=None):
+        """
+        Registra un error de throttling (o 5xx) y devuelve cuántos segundos
+        esperar antes de reintentar. Los errores de página pausan solo el
+        bucket de la página; el resto, el del token.
+        """
+        delay = backoff_delay(attempt)
+        with self._lock:
+            self._retries += 1
+            if code is not None:
+                self._throttled += 1
+
+        if code is not None:
+            if page_key and (code == 32 or code >= 80000):
+                bucket = self._bucket("page", page_key)
+            else:
+                bucket = self._bucket("token", access_token)
+            bucket.set_usage(100)
+            bucket.pause(delay)
+        return delay
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+            stats = {"throttled": self._throttled, "retries": self._retries}
+        stats["buckets"] = {
+            kind: len([k for k, _ in buckets if k == kind]) for kind in ("token", "page")
+        }
+        stats["max_usage"] = max((b.usage for b in buckets.values()), default=0)
+        return stats
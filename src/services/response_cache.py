@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+import time
+from functools import wraps
+from flask import request, make_response
+from utils.config import (
+    RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, REDIS_URL
+)
+
+
+class MemoryBackend:
+    """Backend en memoria del proceso, con expiración por TTL."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}      # clave -> (expira, valor)
+        self._generations = {}  # user_id -> generación
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] >= now}
+            if len(self._entries) >= self.max_entries:
+                # Sigue lleno: se descarta la entrada que expira antes
+                del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+            self._entries[key] = (now + ttl, value)
+
+    def get_generation(self, user_id):
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def bump_generation(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            return self._generations[user_id]
+
+
+class RedisBackend:
+    """Backend en Redis, compartido entre workers y procesos."""
+
+    def __init__(self, url=REDIS_URL):
+        try:
+            import redis
+        except ImportError:
+            raise Exception("RESPONSE_CACHE_BACKEND=redis requiere el paquete redis")
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, json.dumps(value), ex=ttl)
+
+    def get_generation(self, user_id):
+        return int(self._redis.get(f"gen:{user_id}") or 0)
+
+    def bump_generation(self, user_id):
+        return self._redis.incr(f"gen:{user_id}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = RedisBackend() if RESPONSE_CACHE_BACKEND == "redis" else MemoryBackend()
+    return _backend
+
+
+def invalidate_user(user_id: int):
+    """Invalida todas las respuestas cacheadas de `user_id` (se llama tras cada sync)."""
+    return get_backend().bump_generation(user_id)
+
+
+def cached_response(ttl=RESPONSE_CACHE_TTL):
+    """
+    Cachea la respuesta JSON de una vista por `user_id`, ruta y query string.
+
+    La clave incluye la generación del usuario, de modo que invalidate_user
+    deja inaccesibles todas sus entradas anteriores. Las respuestas llevan
+    ETag y un If-None-Match coincidente recibe 304 sin cuerpo.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = request.args.get("user_id", type=int)
+            if not user_id:
+                return view(*args, **kwargs)
+
+            backend = get_backend()
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            key = f"resp:{user_id}:{backend.get_generation(user_id)}:{request.path}?{query}"
+
+            entry = backend.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data(as_text=True)
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(body.encode("utf-8")).hexdigest()
+                }
+                backend.set(key, entry, ttl)
+
+            if request.if_none_match.contains(entry["etag"]):
+                response = make_response("", 304)
+            else:
+                response = make_response(entry["body"], 200)
+                response.mimetype = entry["mimetype"]
+            response.set_etag(entry["etag"])
+            # El TTL aplica solo en el servidor: el cliente revalida siempre
+            # con If-None-Match, así un sync se ve en la siguiente petición
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
@@ -1,59 +1,152 @@
-from transformers import pipeline
-from typing import Dict, Union
-import torch
+import threading
+from typing import Dict, List, Optional, Union
+from services.model_registry import get_pipeline, stats as model_registry_stats
+from services.sentiment_cache import SentimentCache, clave_texto
+from services.sentiment_cascade import MotorCascada
+from services.sentiment_backends import configurar_hilos
+from utils.config import SENTIMENT_MODE, SENTIMENT_BACKEND
 
 
 class AnalizadorTransformers:
-    def __init__(self):
-        # Cargar modelos específicos para español
-        self.modelo_principal = pipeline(
-            "text-classification",
-            model="finiteautomata/beto-sentiment-analysis",
-            tokenizer="finiteautomata/beto-sentiment-analysis",
-            device=0 if torch.cuda.is_available() else -1
-        )
-
-        # Modelo secundario para desempates
-        self.modelo_secundario = pipeline(
-            "sentiment-analysis",
-            model="nlptown/bert-base-multilingual-uncased-sentiment"
-        )
+    MODELO_PRINCIPAL = "finiteautomata/beto-sentiment-analysis"
+    MODELO_SECUNDARIO = "nlptown/bert-base-multilingual-uncased-sentiment"
+
+    # Mapeo de polaridad a categorías estándar
+    MAPEO = {
+        "pos": "positivo",
+        "neg": "negativo",
+        "neu": "neutral"
+    }
+
+    def __init__(self, modelo_principal: str = MODELO_PRINCIPAL,
+                 modelo_secundario: str = MODELO_SECUNDARIO,
+                 cache: Optional[SentimentCache] = None,
+                 pool=None,
+                 backend: str = SENTIMENT_BACKEND):
+        # Los pipelines se piden al registro del proceso: se cargan al primer
+        # uso y se comparten con cualquier otra instancia
+        self.nombre_principal = modelo_principal
+        self.nombre_secundario = modelo_secundario
+        self.backend = backend
+
+        # Con un SentimentWorkerPool la inferencia corre en otros procesos;
+        # la cache se sigue consultando aquí
+        self.pool = pool
+
+        self.cascada = MotorCascada(lambda: self.modelo_principal,
+                                    lambda: self.modelo_secundario)
+
+        # La versión entra en la clave de la cache: cambiar de modelo o de
+        # parámetros de la cascada la invalida
+        self.version_modelo = f"{modelo_principal}|{modelo_secundario}|{self.cascada.version}"
+        if backend != "torch":
+            self.version_modelo += f"|{backend}"
+        self.cache = cache or SentimentCache(self.version_modelo)
+        self.cache.set_model_version(self.version_modelo)
+
+    @property
+    def modelo_principal(self):
+        return get_pipeline("text-classification", self.nombre_principal, self.backend)
+
+    @property
+    def modelo_secundario(self):
+        return get_pipeline("sentiment-analysis", self.nombre_secundario, self.backend)
+
+    def precargar(self):
+        """Carga ambos modelos ahora en lugar de esperar al primer análisis."""
+        if self.pool is not None:
+            self.pool.precargar()
+            return
+        self.modelo_principal
+        self.modelo_secundario
 
     def analizar(self, texto: str) -> Dict[str, Union[str, float]]:
-        if not texto.strip():
-            return {"sentimiento": "neutral", "confianza": 0.0}
-
-        # 1. Análisis con modelo principal (BETO)
-        resultado_principal = self.modelo_principal(texto)[0]
-        etiqueta = resultado_principal['label'].lower()
-        confianza = resultado_principal['score']
-
-        # 2. Verificación con modelo secundario si la confianza es baja
-        if confianza < 0.7:
-            resultado_secundario = self.modelo_secundario(texto)[0]
-            if abs(resultado_secundario['score'] - confianza) > 0.2:
-                etiqueta = "neutral"  # Caso de discordancia alta
-
-        # 3. Mapeo a categorías estándar
-        mapeo = {
-            "pos": "positivo",
-            "neg": "negativo",
-            "1": "negativo",  # Para el modelo secundario
-            "5": "positivo"
-        }
-
-        return {
-            "sentimiento": mapeo.get(etiqueta, "neutral"),
-            "confianza": round(confianza, 4),
-            "modelo": "BETO" if confianza >= 0.7 else "BERT multilingual"
-        }
+        return self.analizar_lote([texto])[0]
+
+    def analizar_lote(self, textos: List[str], batch_size: int = 16) -> List[Dict[str, Union[str, float]]]:
+        """
+        Analiza varios textos a la vez. Los textos ya vistos (misma forma
+        normalizada) salen de la cache; el resto se deduplica y pasa por
+        los modelos en lotes de `batch_size`. El resultado de cada texto es
+        idéntico al de `analizar`.
+        """
+        resultados = [{"sentimiento": "neutral", "confianza": 0.0}
+                      for _ in textos]
+        claves = {i: clave_texto(t) for i, t in enumerate(textos) if t.strip()}
+        if not claves:
+            return resultados
+
+        conocidos = self.cache.get_many(set(claves.values()))
+
+        # Un texto por clave sin resultado en la cache
+        pendientes = {}
+        for i, clave in claves.items():
+            if clave not in conocidos and clave not in pendientes:
+                pendientes[clave] = textos[i]
+
+        if pendientes:
+            inferir = self.pool.inferir if self.pool is not None else self._inferir
+            nuevos = dict(zip(pendientes, inferir(
+                list(pendientes.values()), batch_size)))
+            self.cache.put_many(nuevos)
+            conocidos.update(nuevos)
+
+        for i, clave in claves.items():
+            resultados[i] = dict(conocidos[clave])
+        return resultados
+
+    def _inferir(self, textos: List[str], batch_size: int) -> List[Dict[str, Union[str, float]]]:
+        resultados = []
+        for r in self.cascada.inferir(textos, batch_size):
+            polaridad, confianza = max(r["polaridades"].items(), key=lambda x: x[1])
+            resultados.append({
+                "sentimiento": self.MAPEO[polaridad],
+                "confianza": round(confianza, 4),
+                "modelo": "BERT multilingual" if r["escalado"] else "BETO"
+            })
+        return resultados
+
+    def estadisticas(self):
+        """Cache, tiempos por modelo y tasa de escalamiento de la cascada."""
+        # En modo process la cascada que trabaja es la de cada worker
+        cascada = (self.pool.estadisticas() if self.pool is not None
+                   else self.cascada.estadisticas())
+        return {"cache": self.cache.stats(), "cascada": cascada}
+
+
+_analizador = None
+_analizador_lock = threading.Lock()
+
+
+def get_analizador() -> AnalizadorTransformers:
+    """Analizador compartido por todo el proceso (los modelos cargan al primer uso)."""
+    global _analizador
+    if _analizador is None:
+        with _analizador_lock:
+            if _analizador is None:
+                pool = None
+                if SENTIMENT_MODE == "process":
+                    from services.sentiment_workers import get_worker_pool
+                    pool = get_worker_pool()
+                else:
+                    configurar_hilos()
+                _analizador = AnalizadorTransformers(pool=pool)
+    return _analizador
+
+
+def warm_up():
+    """Precarga los modelos del analizador compartido y reporta su costo."""
+    get_analizador().precargar()
+    for info in model_registry_stats():
+        print(f"🧠 {info['model']}: {info['load_seconds']}s, "
+              f"{(info['parameter_bytes'] or 0) / 2**20:.0f} MB en parámetros")
 
 
 # -------------------------------------------------------------------
 # EJEMPLO DE USO
 # -------------------------------------------------------------------
 if __name__ == "__main__":
-    analizador = AnalizadorTransformers()
+    analizador = get_analizador()
 
     textos = [
         "El servicio fue excepcional, totalmente recomendado!",
@@ -62,9 +155,10 @@ if __name__ == "__main__":
         "No está mal, pero el precio es elevado para lo que ofrece"
     ]
 
-    for texto in textos:
+    for texto, resultado in zip(textos, analizador.analizar_lote(textos)):
         print(f"\n📝 Texto: {texto}")
-        resultado = analizador.analizar(texto)
         print(f"✅ Sentimiento: {resultado['sentimiento'].upper()}")
         print(f"🔍 Confianza: {resultado['confianza'] * 100:.2f}%")
         print(f"⚙️ Modelo usado: {resultado['modelo']}")
+
+    print(f"\n📊 Estadísticas: {analizador.estadisticas()}")
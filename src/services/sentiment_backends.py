@@ -0,0 +1,116 @@
+from typing import Dict, List
+from transformers import pipeline
+import torch
+from utils.config import SENTIMENT_THREADS
+
+
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+# Hilos intra-op vigentes en este proceso (también para las sesiones ONNX)
+_hilos = SENTIMENT_THREADS
+
+
+def configurar_hilos(threads: int = SENTIMENT_THREADS):
+    """Fija los hilos intra-op de torch/onnxruntime; 0 deja el valor por defecto."""
+    global _hilos
+    _hilos = threads
+    if threads > 0:
+        torch.set_num_threads(threads)
+
+
+def _torch(task, model):
+    return pipeline(task, model=model, tokenizer=model,
+                    device=0 if torch.cuda.is_available() else -1)
+
+
+def _torch_int8(task, model):
+    # La cuantización dinámica solo aplica en CPU: pesos de las capas
+    # lineales en int8, activaciones cuantizadas al vuelo
+    pipe = pipeline(task, model=model, tokenizer=model, device=-1)
+    pipe.model = torch.quantization.quantize_dynamic(
+        pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipe
+
+
+def _onnx(task, model):
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise Exception(
+            "El backend 'onnx' requiere instalar optimum[onnxruntime]")
+
+    options = onnxruntime.SessionOptions()
+    if _hilos > 0:
+        options.intra_op_num_threads = _hilos
+
+    ort_model = ORTModelForSequenceClassification.from_pretrained(
+        model, export=True, session_options=options)
+    tokenizer = AutoTokenizer.from_pretrained(model)
+    return pipeline(task, model=ort_model, tokenizer=tokenizer)
+
+
+_LOADERS = {
+    "torch": _torch,
+    "torch-int8": _torch_int8,
+    "onnx": _onnx,
+}
+
+
+def cargar_pipeline(task: str, model: str, backend: str = "torch"):
+    loader = _LOADERS.get(backend)
+    if loader is None:
+        raise ValueError(
+            f"Backend de sentimiento desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    return loader(task, model)
+
+
+def verificar_paridad(textos: List[str], backend: str, tolerancia: float = 0.02,
+                      batch_size: int = 16) -> Dict:
+    """
+    Compara las etiquetas de `backend` contra el backend "torch" actual
+    sobre `textos`, sin pasar por la cache. `ok` es True si la proporción de
+    etiquetas distintas no supera `tolerancia`.
+    """
+    from services.sentiment import AnalizadorTransformers
+
+    referencia = AnalizadorTransformers(backend="torch")._inferir(textos, batch_size)
+    candidato = AnalizadorTransformers(backend=backend)._inferir(textos, batch_size)
+
+    discrepancias = [{
+        "texto": texto,
+        "torch": ref["sentimiento"],
+        backend: cand["sentimiento"],
+    } for texto, ref, cand in zip(textos, referencia, candidato)
+        if ref["sentimiento"] != cand["sentimiento"]]
+
+    tasa = len(discrepancias) / len(textos) if textos else 0.0
+    return {
+        "backend": backend,
+        "total": len(textos),
+        "tasa_discrepancia": round(tasa, 4),
+        "max_delta_confianza": max(
+            (abs(r["confianza"] - c["confianza"]) for r, c in zip(referencia, candidato)),
+            default=0.0),
+        "discrepancias": discrepancias,
+        "ok": tasa <= tolerancia,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    textos = [
+        "El servicio fue excepcional, totalmente recomendado!",
+        "Odio cuando no cumplen con lo prometido",
+        "La atención es regular, podría mejorar",
+        "No está mal, pero el precio es elevado para lo que ofrece"
+    ]
+    backend = sys.argv[1] if len(sys.argv) > 1 else "torch-int8"
+    resultado = verificar_paridad(textos, backend)
+    print(f"{'✅' if resultado['ok'] else '❌'} {backend}: "
+          f"{resultado['tasa_discrepancia'] * 100:.1f}% de etiquetas distintas, "
+          f"Δconfianza máx {resultado['max_delta_confianza']:.4f}")
+    for d in resultado["discrepancias"]:
+        print(f"  - {d}")
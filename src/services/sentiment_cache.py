@@ -0,0 +1,132 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from services.database_service import execute_query, upsert_many
+from utils.config import SENTIMENT_CACHE_SIZE, SENTIMENT_CACHE_DB
+
+
+def normalizar_texto(texto: str) -> str:
+    """Forma canónica para la cache: Unicode NFKC y espacios colapsados."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", texto)).strip()
+
+
+def clave_texto(texto: str) -> str:
+    return hashlib.sha256(normalizar_texto(texto).encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    """
+    Cache de resultados de sentimiento indexada por el hash del texto
+    normalizado y la versión de los modelos.
+
+    Un LRU en memoria atiende los textos repetidos del proceso; los fallos
+    se consultan en la tabla `sentiment_cache` (si SENTIMENT_CACHE_DB está
+    activo). Al cambiar `model_version` el LRU se vacía y las entradas de la
+    tabla de otras versiones dejan de coincidir.
+    """
+
+    def __init__(self, model_version: str, max_size: int = SENTIMENT_CACHE_SIZE,
+                 use_db: bool = SENTIMENT_CACHE_DB):
+        self.model_version = model_version
+        self.max_size = max_size
+        self.use_db = use_db
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._db_hits = 0
+        self._misses = 0
+
+    def set_model_version(self, model_version: str):
+        with self._lock:
+            if model_version != self.model_version:
+                self.model_version = model_version
+                self._lru.clear()
+
+    def get_many(self, claves):
+        """Devuelve {clave: resultado} para las claves presentes en la cache."""
+        encontrados = {}
+        pendientes = []
+        with self._lock:
+            for clave in claves:
+                if clave in self._lru:
+                    self._lru.move_to_end(clave)
+                    encontrados[clave] = self._lru[clave]
+                else:
+                    pendientes.append(clave)
+            self._hits += len(encontrados)
+
+        desde_db = self._db_get(pendientes) if pendientes else {}
+        with self._lock:
+            self._db_hits += len(desde_db)
+            self._misses += len(pendientes) - len(desde_db)
+        if desde_db:
+            self._lru_put(desde_db)
+            encontrados.update(desde_db)
+        return encontrados
+
+    def put_many(self, resultados):
+        """Guarda {clave: resultado} en el LRU y en la tabla."""
+        if not resultados:
+            return
+        self._lru_put(resultados)
+        self._db_put(resultados)
+
+    def _lru_put(self, resultados):
+        with self._lock:
+            for clave, resultado in resultados.items():
+                self._lru[clave] = resultado
+                self._lru.move_to_end(clave)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _db_get(self, claves):
+        if not self.use_db:
+            return {}
+        try:
+            rows = execute_query(
+                """
+                SELECT text_hash, result FROM sentiment_cache
+                WHERE model_version = %s AND text_hash = ANY(%s)
+                """,
+                (self.model_version, list(claves)),
+                fetch=True
+            )
+            return {row["text_hash"]: row["result"] for row in rows}
+        except Exception as e:
+            print(f"⚠️ Error al leer la cache de sentimiento: {e}")
+            return {}
+
+    def _db_put(self, resultados):
+        if not self.use_db:
+            return
+        try:
+            upsert_many("sentiment_cache", [{
+                "text_hash": clave,
+                "model_version": self.model_version,
+                "result": resultado
+            } for clave, resultado in resultados.items()],
+                ["text_hash", "model_version"])
+        except Exception as e:
+            print(f"⚠️ Error al guardar en la cache de sentimiento: {e}")
+
+    def purgar_versiones_antiguas(self):
+        """Elimina de la tabla las entradas de otras versiones de modelos."""
+        execute_query(
+            "DELETE FROM sentiment_cache WHERE model_version <> %s",
+            (self.model_version,)
+        )
+
+    def stats(self):
+        with self._lock:
+            consultas = self._hits + self._db_hits + self._misses
+            return {
+                "model_version": self.model_version,
+                "size": len(self._lru),
+                "hits": self._hits,
+                "db_hits": self._db_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._db_hits) / consultas, 4) if consultas else 0.0,
+            }
@@ -0,0 +1,166 @@
+import threading
+import time
+from typing import Dict, List
+import torch
+from utils.config import (
+    SENTIMENT_UMBRAL_CONFIANZA, SENTIMENT_PESO_SECUNDARIO,
+    SENTIMENT_TEMPERATURA_PRINCIPAL, SENTIMENT_TEMPERATURA_SECUNDARIO
+)
+
+
+POLARIDADES = ("neg", "neu", "pos")
+
+
+def _polaridad_de_etiqueta(etiqueta: str) -> str:
+    """
+    Lleva la etiqueta de cualquiera de los modelos a neg/neu/pos:
+    BETO usa NEG/NEU/POS y el multilingüe "1 star" ... "5 stars".
+    """
+    etiqueta = etiqueta.lower()
+    if etiqueta[:1].isdigit():
+        estrellas = int(etiqueta[0])
+        if estrellas <= 2:
+            return "neg"
+        return "neu" if estrellas == 3 else "pos"
+    for polaridad in POLARIDADES:
+        if etiqueta.startswith(polaridad):
+            return polaridad
+    return "neu"
+
+
+class MotorCascada:
+    """
+    Cascada de dos modelos en una sola pasada por lote.
+
+    Cada texto se tokeniza una vez para el modelo principal; si su
+    confianza calibrada (softmax con temperatura, agregada a neg/neu/pos)
+    queda bajo `umbral_confianza`, el texto escala al modelo secundario
+    reutilizando los tensores ya tokenizados cuando ambos modelos comparten
+    tokenizador. La decisión final mezcla las dos distribuciones con
+    `peso_secundario`. Lleva tiempos por etapa y la tasa de escalamiento.
+    """
+
+    def __init__(self, obtener_principal, obtener_secundario,
+                 umbral_confianza: float = SENTIMENT_UMBRAL_CONFIANZA,
+                 peso_secundario: float = SENTIMENT_PESO_SECUNDARIO,
+                 temperatura_principal: float = SENTIMENT_TEMPERATURA_PRINCIPAL,
+                 temperatura_secundario: float = SENTIMENT_TEMPERATURA_SECUNDARIO):
+        # Se reciben funciones para no forzar la carga de los modelos aquí
+        self._obtener_principal = obtener_principal
+        self._obtener_secundario = obtener_secundario
+        self.umbral_confianza = umbral_confianza
+        self.peso_secundario = peso_secundario
+        self.temperatura_principal = temperatura_principal
+        self.temperatura_secundario = temperatura_secundario
+
+        # (tokenizador principal, secundario) -> comparten vocabulario
+        self._tokenizador_compartido = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "textos": 0,
+            "escalados": 0,
+            "segundos_tokenizacion": 0.0,
+            "segundos_principal": 0.0,
+            "segundos_secundario": 0.0,
+        }
+
+    @property
+    def version(self) -> str:
+        return (f"cascada:{self.umbral_confianza}:{self.peso_secundario}:"
+                f"{self.temperatura_principal}:{self.temperatura_secundario}")
+
+    def inferir(self, textos: List[str], batch_size: int = 16) -> List[Dict[str, float]]:
+        """Devuelve, por texto, {"polaridades": {neg, neu, pos}, "escalado": bool}."""
+        resultados = []
+        for inicio in range(0, len(textos), batch_size):
+            resultados.extend(self._inferir_lote(textos[inicio:inicio + batch_size]))
+        return resultados
+
+    def _tokenizar(self, pipe, textos):
+        max_length = min(pipe.tokenizer.model_max_length, 512)
+        return pipe.tokenizer(textos, padding=True, truncation=True,
+                              max_length=max_length, return_tensors="pt")
+
+    def _polaridades(self, pipe, entradas, temperatura):
+        with torch.no_grad():
+            logits = pipe.model(**entradas.to(pipe.device)).logits
+        probs = torch.softmax(logits.float() / temperatura, dim=-1).cpu()
+
+        etiquetas = pipe.model.config.id2label
+        polaridades = []
+        for fila in probs.tolist():
+            agregadas = dict.fromkeys(POLARIDADES, 0.0)
+            for indice, prob in enumerate(fila):
+                agregadas[_polaridad_de_etiqueta(etiquetas[indice])] += prob
+            polaridades.append(agregadas)
+        return polaridades
+
+    def _mismo_tokenizador(self, principal, secundario) -> bool:
+        # Comparar vocabularios arma dicts de decenas de miles de entradas:
+        # se hace una sola vez por par de modelos y no en cada lote
+        clave = (principal.tokenizer.name_or_path, secundario.tokenizer.name_or_path)
+        mismo = self._tokenizador_compartido.get(clave)
+        if mismo is None:
+            mismo = (clave[0] == clave[1]
+                     or principal.tokenizer.get_vocab() == secundario.tokenizer.get_vocab())
+            self._tokenizador_compartido[clave] = mismo
+        return mismo
+
+    def _inferir_lote(self, textos):
+        principal = self._obtener_principal()
+
+        inicio = time.perf_counter()
+        entradas = self._tokenizar(principal, textos)
+        tokenizado = time.perf_counter()
+        resultados = [{"polaridades": p, "escalado": False}
+                      for p in self._polaridades(principal, entradas, self.temperatura_principal)]
+        fin_principal = time.perf_counter()
+
+        dudosos = [i for i, r in enumerate(resultados)
+                   if max(r["polaridades"].values()) < self.umbral_confianza]
+
+        segundos_tokenizacion = tokenizado - inicio
+        segundos_secundario = 0.0
+        if dudosos:
+            secundario = self._obtener_secundario()
+            inicio_secundario = time.perf_counter()
+            if self._mismo_tokenizador(principal, secundario):
+                entradas_secundario = entradas.__class__(
+                    {k: v[dudosos] for k, v in entradas.items()})
+            else:
+                entradas_secundario = self._tokenizar(
+                    secundario, [textos[i] for i in dudosos])
+            segundos_tokenizacion += time.perf_counter() - inicio_secundario
+
+            inicio_secundario = time.perf_counter()
+            secundarias = self._polaridades(
+                secundario, entradas_secundario, self.temperatura_secundario)
+            segundos_secundario = time.perf_counter() - inicio_secundario
+
+            peso = self.peso_secundario
+            for i, polaridades_secundario in zip(dudosos, secundarias):
+                primarias = resultados[i]["polaridades"]
+                resultados[i] = {
+                    "polaridades": {
+                        p: (1 - peso) * primarias[p] + peso * polaridades_secundario[p]
+                        for p in POLARIDADES
+                    },
+                    "escalado": True
+                }
+
+        with self._lock:
+            self._stats["textos"] += len(textos)
+            self._stats["escalados"] += len(dudosos)
+            self._stats["segundos_tokenizacion"] += segundos_tokenizacion
+            self._stats["segundos_principal"] += fin_principal - tokenizado
+            self._stats["segundos_secundario"] += segundos_secundario
+
+        return resultados
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tasa_escalamiento"] = round(
+            stats["escalados"] / stats["textos"], 4) if stats["textos"] else 0.0
+        stats["umbral_confianza"] = self.umbral_confianza
+        return stats
@@ -0,0 +1,139 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+from utils.config import (
+    SENTIMENT_WORKERS, SENTIMENT_THREADS_PER_WORKER, SENTIMENT_MP_START
+)
+
+
+# Analizador propio de cada proceso worker, creado en _init_worker
+_worker_analizador = None
+# Barrera compartida por todos los workers del pool (ver _en_cada_worker)
+_worker_barrier = None
+
+# Espera máxima para reunir a todos los workers al pedir estadísticas
+ESTADISTICAS_TIMEOUT = 30
+
+
+def _init_worker(threads: int, barrier):
+    global _worker_analizador, _worker_barrier
+    _worker_barrier = barrier
+    from services.sentiment import AnalizadorTransformers
+    from services.sentiment_backends import configurar_hilos
+
+    # Hilos intra-op por worker: workers * hilos no debería superar los núcleos
+    configurar_hilos(threads)
+    _worker_analizador = AnalizadorTransformers()
+    _worker_analizador.precargar()
+
+
+def _sincronizar(timeout):
+    # Bloquea este worker hasta que los demás tengan también su tarea: así
+    # cada una de las `workers` tareas cae en un proceso distinto, y el
+    # executor tiene que arrancar los que aún no existían
+    _worker_barrier.wait(timeout)
+
+
+def _listo(timeout):
+    _sincronizar(timeout)
+    return os.getpid()
+
+
+def _estadisticas_worker(timeout):
+    _sincronizar(timeout)
+    return {"pid": os.getpid(), **_worker_analizador.cascada.estadisticas()}
+
+
+def _inferir_en_worker(textos: List[str], batch_size: int):
+    return _worker_analizador._inferir(textos, batch_size)
+
+
+class SentimentWorkerPool:
+    """
+    Pool de procesos para la inferencia de sentimiento.
+
+    Cada worker carga los modelos una sola vez al arrancar y queda con
+    `threads_per_worker` hilos de torch. Los lotes se envían por la cola
+    del ProcessPoolExecutor y los resultados vuelven como futures, de modo
+    que la inferencia no retiene el GIL del proceso de Flask.
+    """
+
+    def __init__(self, workers: int = SENTIMENT_WORKERS,
+                 threads_per_worker: int = SENTIMENT_THREADS_PER_WORKER,
+                 start_method: str = SENTIMENT_MP_START):
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        context = multiprocessing.get_context(start_method)
+        self._barrier = context.Barrier(workers)
+        self._barrier_lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(threads_per_worker, self._barrier)
+        )
+
+    def submit(self, textos: List[str], batch_size: int = 16):
+        """Envía un lote a un worker y devuelve un Future con sus resultados."""
+        return self._executor.submit(_inferir_en_worker, list(textos), batch_size)
+
+    def inferir(self, textos: List[str], batch_size: int = 16):
+        """Reparte `textos` entre los workers y junta los resultados en orden."""
+        if not textos:
+            return []
+        size = max(batch_size, -(-len(textos) // self.workers))
+        futures = [self.submit(textos[i:i + size], batch_size)
+                   for i in range(0, len(textos), size)]
+        resultados = []
+        for future in futures:
+            resultados.extend(future.result())
+        return resultados
+
+    def _en_cada_worker(self, fn, timeout=None):
+        """Ejecuta `fn` una vez en cada worker y devuelve sus resultados."""
+        with self._barrier_lock:
+            futures = [self._executor.submit(fn, timeout) for _ in range(self.workers)]
+            try:
+                return [future.result() for future in futures]
+            except threading.BrokenBarrierError:
+                # Algún worker no llegó a tiempo (ocupado con otro lote)
+                self._barrier.reset()
+                raise
+
+    def precargar(self):
+        """
+        Arranca todos los workers y espera a que cada uno termine de cargar
+        los modelos (la carga ocurre en el initializer de cada proceso).
+        """
+        self._en_cada_worker(_listo)
+
+    def estadisticas(self):
+        """Estadísticas de la cascada de cada worker y su agregado."""
+        try:
+            por_worker = self._en_cada_worker(_estadisticas_worker, ESTADISTICAS_TIMEOUT)
+        except threading.BrokenBarrierError:
+            return {"error": "No todos los workers respondieron a tiempo"}
+
+        total = {clave: sum(w[clave] for w in por_worker)
+                 for clave in ("textos", "escalados", "segundos_tokenizacion",
+                               "segundos_principal", "segundos_secundario")}
+        total["tasa_escalamiento"] = round(
+            total["escalados"] / total["textos"], 4) if total["textos"] else 0.0
+        return {**total, "workers": por_worker}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+
+
+def get_worker_pool() -> SentimentWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = SentimentWorkerPool()
+        atexit.register(_pool.shutdown)
+    return _pool
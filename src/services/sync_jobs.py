@@ -0,0 +1,218 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services.facebook_service import (
+    sync_posts, sync_comments, sync_post_reactions_summary, sync_all_page_metrics,
+    get_user_access_data, get_page_posts
+)
+from services.sync_orchestrator import Stage, PostChannel, run_stages
+from services.graph_client import graph_client, GraphAPIError
+from services.tenant_context import invalidate_tenant
+from services.response_cache import invalidate_user
+from utils.config import SYNC_JOB_WORKERS, SYNC_JOB_RETENTION, SYNC_FIELD_EXPANSION
+
+
+# Etapas de un sync completo. comments y post_reactions_summary no esperan
+# a que termine posts: parten de los posts ya guardados y reciben por un
+# PostChannel los que la etapa de posts va descubriendo. page_metrics es
+# independiente. Cada etapa devuelve el número de filas escritas.
+#
+# Con SYNC_FIELD_EXPANSION ningún PostChannel alimenta a comments y
+# post_reactions_summary: dependen de posts y arrancan cuando termina (si
+# falla, se omiten), solo sobre los posts que la pasada expandida no cubrió.
+SYNC_STAGE_NAMES = ["posts", "comments", "post_reactions_summary", "page_metrics"]
+
+
+def build_sync_stages(user_id: int, expand=SYNC_FIELD_EXPANSION, tenant=None):
+    # El contexto (token y página) se resuelve una vez por job y se pasa a
+    # todas las etapas
+    tenant = tenant or get_user_access_data(user_id)
+    if expand:
+        return _build_expanded_sync_stages(user_id, tenant)
+
+    channel = PostChannel()
+
+    def posts():
+        try:
+            return sync_posts(user_id, on_posts=channel.publish, tenant=tenant)
+        finally:
+            channel.close()
+
+    def stored_posts():
+        return get_page_posts(tenant["page_id"])
+
+    return [
+        Stage("posts", posts),
+        Stage("comments", lambda: sync_comments(
+            user_id, channel.subscribe(stored_posts()), tenant=tenant)),
+        Stage("post_reactions_summary", lambda: sync_post_reactions_summary(
+            user_id, channel.subscribe(stored_posts()), tenant=tenant)),
+        Stage("page_metrics", lambda: sync_all_page_metrics(user_id, tenant=tenant)),
+    ]
+
+
+def _build_expanded_sync_stages(user_id: int, tenant):
+    # Posts cuyos comentarios y reacciones ya guardó la pasada expandida
+    # (incluye los ya guardados que caen en la ventana `since`); las etapas
+    # siguientes, que arrancan cuando posts termina, los omiten
+    handled = set()
+
+    def posts():
+        return sync_posts(user_id, expand=True, tenant=tenant,
+                          on_posts=lambda saved: handled.update(p["post_id"] for p in saved))
+
+    def remaining_posts():
+        return [[p for p in get_page_posts(tenant["page_id"])
+                 if p["post_id"] not in handled]]
+
+    return [
+        Stage("posts", posts),
+        Stage("comments", lambda: sync_comments(user_id, remaining_posts(), tenant=tenant),
+              depends_on=("posts",)),
+        Stage("post_reactions_summary", lambda: sync_post_reactions_summary(
+            user_id, remaining_posts(), tenant=tenant), depends_on=("posts",)),
+        Stage("page_metrics", lambda: sync_all_page_metrics(user_id, tenant=tenant)),
+    ]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class SyncJob:
+    """Estado y progreso de un sync de un usuario."""
+
+    def __init__(self, user_id: int, stage_names=SYNC_STAGE_NAMES, tenant=None):
+        self.job_id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.tenant = tenant
+        self.status = "queued"
+        self.error = None
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {name: {"status": "pending", "rows": None, "seconds": None}
+                       for name in stage_names}
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def _update_stage(self, name, **fields):
+        with self._lock:
+            self.stages[name].update(fields)
+
+    def run(self):
+        self.status = "running"
+        self.started_at = _now()
+        start = time.perf_counter()
+        try:
+            run_stages(build_sync_stages(self.user_id, tenant=self.tenant),
+                       on_update=self._update_stage)
+            self.status = "succeeded"
+        except Exception as e:
+            print(f"❌ Error en sync del usuario {self.user_id}: {str(e)}")
+            self.status = "failed"
+            self.error = str(e)
+            # Token inválido o vencido: el siguiente intento relee el contexto
+            # por si el token ya se actualizó en la base de datos
+            if isinstance(e, GraphAPIError) and e.code == 190:
+                invalidate_tenant(self.user_id)
+        finally:
+            # Aun si falla a mitad, lo ya escrito invalida lo cacheado
+            invalidate_user(self.user_id)
+            self.seconds = round(time.perf_counter() - start, 3)
+            self.finished_at = _now()
+            print(f"🌐 Graph API: {graph_client.stats()}")
+
+    def to_dict(self):
+        with self._lock:
+            stages = [{"name": name, **info} for name, info in self.stages.items()]
+        return {
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "seconds": self.seconds,
+            "stages": stages,
+        }
+
+
+class LocalRunner:
+    """Ejecuta los jobs en hilos del propio proceso."""
+
+    def __init__(self, workers=SYNC_JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sync-job")
+
+    def submit(self, job: SyncJob):
+        self._executor.submit(job.run)
+
+
+class SyncJobQueue:
+    """
+    Cola de syncs con un job activo como máximo por usuario.
+
+    `runner` es cualquier objeto con `submit(job)`; por defecto LocalRunner.
+    Los jobs terminados se conservan SYNC_JOB_RETENTION segundos para
+    poder consultar su estado.
+    """
+
+    def __init__(self, runner=None, retention=SYNC_JOB_RETENTION):
+        self.runner = runner or LocalRunner()
+        self.retention = retention
+        self._jobs = {}
+        self._active_by_user = {}
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        limit = _now().timestamp() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at and job.finished_at.timestamp() < limit]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def claim(self, user_id: int, tenant=None):
+        """
+        Registra un job nuevo para el usuario sin ejecutarlo y devuelve
+        `(job, creado)`; si ya tiene uno activo, ese job y False. `tenant`
+        es el contexto del usuario si ya se tiene cargado.
+        """
+        with self._lock:
+            self._prune()
+            current = self._active_by_user.get(user_id)
+            if current is not None and current.active:
+                return current, False
+
+            job = SyncJob(user_id, tenant=tenant)
+            self._jobs[job.job_id] = job
+            self._active_by_user[user_id] = job
+            return job, True
+
+    def enqueue(self, user_id: int):
+        """Devuelve `(job, creado)`; si el usuario ya tiene un sync activo, ese job y False."""
+        job, created = self.claim(user_id)
+        if created:
+            self.runner.submit(job)
+        return job, created
+
+    def enqueue_and_wait(self, user_id: int):
+        """Como enqueue, pero ejecuta el job en el hilo actual."""
+        job, created = self.claim(user_id)
+        if created:
+            job.run()
+        return job, created
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+sync_queue = SyncJobQueue()
@@ -0,0 +1,133 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """Etapa de un sync: `fn()` devuelve las filas escritas; `depends_on` son nombres de etapas."""
+
+    def __init__(self, name, fn, depends_on=()):
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+
+
+class PostChannel:
+    """
+    Canal de posts recién guardados entre la etapa de posts y las etapas
+    que trabajan por post. Un productor publica listas de filas y cada
+    consumidor las recibe en lotes a medida que llegan, sin repetir posts.
+    """
+
+    def __init__(self):
+        self._batches = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, posts):
+        if not posts:
+            return
+        with self._cond:
+            self._batches.append(list(posts))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def subscribe(self, initial=None):
+        """
+        Entrega primero `initial` (p.ej. los posts ya guardados) y luego cada
+        lote publicado, hasta que el canal se cierra.
+        """
+        seen = set()
+
+        def fresh(posts):
+            batch = [p for p in posts if p["post_id"] not in seen]
+            seen.update(p["post_id"] for p in batch)
+            return batch
+
+        if initial:
+            batch = fresh(initial)
+            if batch:
+                yield batch
+
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self._batches) and not self._closed:
+                    self._cond.wait()
+                pending = self._batches[index:]
+                index = len(self._batches)
+                closed = self._closed
+
+            for posts in pending:
+                batch = fresh(posts)
+                if batch:
+                    yield batch
+            if closed and not pending:
+                return
+
+
+def run_stages(stages, on_update=None):
+    """
+    Ejecuta las etapas respetando `depends_on`: cada una arranca en cuanto
+    terminan sus dependencias, y las independientes corren en paralelo. Si
+    una etapa falla, las que dependen de ella se marcan `skipped` y el resto
+    sigue; al final se relanza el primer error.
+
+    `on_update(name, **campos)` recibe status, rows y seconds de cada etapa.
+    Devuelve {nombre: filas} de las etapas completadas.
+    """
+    on_update = on_update or (lambda name, **fields: None)
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+    failed = set()
+    errors = []
+
+    def timed(stage):
+        start = time.perf_counter()
+        on_update(stage.name, status="running")
+        try:
+            rows = stage.fn()
+        except Exception:
+            on_update(stage.name, status="failed",
+                      seconds=round(time.perf_counter() - start, 3))
+            raise
+        on_update(stage.name, status="succeeded", rows=rows,
+                  seconds=round(time.perf_counter() - start, 3))
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max(len(stages), 1),
+                            thread_name_prefix="sync-stage") as executor:
+        running = {}
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name, stage in list(pending.items()):
+                    if any(dep in failed for dep in stage.depends_on):
+                        del pending[name]
+                        failed.add(name)
+                        on_update(name, status="skipped")
+                        progressed = True
+                    elif all(dep in results for dep in stage.depends_on):
+                        del pending[name]
+                        running[executor.submit(timed, stage)] = name
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    errors.append(e)
+
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,72 @@
+import threading
+import time
+from flask import g, has_request_context
+from services.database_service import execute_query
+from utils.config import TENANT_CONTEXT_TTL
+
+
+# Contexto de un tenant: user_id, access_token, page_external_id y page_id.
+# Se resuelve una vez por request (memo en flask.g) y se guarda en una
+# caché del proceso con TTL corto; los syncs lo resuelven al armar el job y
+# lo pasan a cada etapa.
+_cache = {}  # user_id -> (expira, contexto)
+_cache_lock = threading.Lock()
+
+
+def _load_tenant(user_id: int):
+    result = execute_query(
+        """
+        SELECT u.user_id, u.access_token, p.page_external_id, p.page_id
+        FROM users u
+        JOIN pages p ON u.user_id = p.user_id
+        WHERE u.user_id = %s
+        """,
+        (user_id,),
+        fetch=True
+    )
+    if not result:
+        raise Exception("Usuario o página no encontrados.")
+    return dict(result[0])
+
+
+def _cached_tenant(user_id: int):
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry[0] >= now:
+            return entry[1]
+
+    context = _load_tenant(user_id)
+    with _cache_lock:
+        _cache[user_id] = (now + TENANT_CONTEXT_TTL, context)
+    return context
+
+
+def resolve_tenant(user_id: int):
+    """
+    Devuelve el contexto del usuario. Dentro de un request de Flask se
+    consulta como mucho una vez por request; fuera, la caché del proceso
+    evita repetir la consulta durante TENANT_CONTEXT_TTL segundos.
+    """
+    if has_request_context():
+        memo = g.setdefault("tenant_contexts", {})
+        if user_id not in memo:
+            memo[user_id] = _cached_tenant(user_id)
+        return dict(memo[user_id])
+    return dict(_cached_tenant(user_id))
+
+
+def invalidate_tenant(user_id: int = None):
+    """Descarta el contexto cacheado de un usuario (o de todos)."""
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+    if has_request_context():
+        memo = g.get("tenant_contexts")
+        if memo is not None:
+            if user_id is None:
+                memo.clear()
+            else:
+                memo.pop(user_id, None)
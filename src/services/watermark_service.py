@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from services.database_service import execute_query, upsert_many
+
+
+SCOPE_PAGE_POSTS = "page_posts"
+SCOPE_POST_COMMENTS = "post_comments"
+
+
+def parse_fb_time(value):
+    """Convierte un `created_time` de la Graph API (2024-01-31T18:00:00+0000) a datetime."""
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+
+
+def get_watermarks(scope, external_ids):
+    """Devuelve {external_id: {"last_created_time", "cursor"}} para los IDs con marca."""
+    external_ids = list(external_ids)
+    if not external_ids:
+        return {}
+
+    rows = execute_query(
+        """
+        SELECT external_id, last_created_time, cursor
+        FROM sync_watermarks
+        WHERE scope = %s AND external_id = ANY(%s)
+        """,
+        (scope, external_ids),
+        fetch=True
+    )
+    return {row["external_id"]: row for row in rows}
+
+
+def get_watermark(scope, external_id):
+    return get_watermarks(scope, [external_id]).get(external_id)
+
+
+def save_watermarks(scope, marks):
+    """
+    Guarda marcas de agua. `marks` es una lista de dicts con `external_id`,
+    `last_created_time` y `cursor`.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [{
+        "scope": scope,
+        "external_id": mark["external_id"],
+        "last_created_time": mark.get("last_created_time"),
+        "cursor": mark.get("cursor"),
+        "updated_at": now
+    } for mark in marks]
+
+    return upsert_many("sync_watermarks", rows, ["scope", "external_id"],
+                       update_columns=["last_created_time", "cursor", "updated_at"])
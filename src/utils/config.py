@@ -10,3 +10,89 @@ DBNAME = os.getenv("dbname")
 # Facebook API
 PAGE_ID = "111979705309346"
 ACCESS_TOKEN = os.getenv("TOKEN_TEST")
+
+# Pool de conexiones a la base de datos
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "30"))
+DB_POOL_HEALTH_CHECK_AFTER = float(
+    os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30"))
+
+# Carga masiva: a partir de este número de filas insert_many usa COPY
+BULK_COPY_THRESHOLD = int(os.getenv("BULK_COPY_THRESHOLD", "500"))
+BULK_VALUES_PAGE_SIZE = int(os.getenv("BULK_VALUES_PAGE_SIZE", "200"))
+
+# Peticiones concurrentes a la Graph API
+GRAPH_MAX_WORKERS = int(os.getenv("GRAPH_MAX_WORKERS", "8"))
+GRAPH_MAX_CONCURRENCY_PER_TOKEN = int(
+    os.getenv("GRAPH_MAX_CONCURRENCY_PER_TOKEN", "4"))
+
+# Cliente HTTP de la Graph API
+GRAPH_HTTP_POOL_SIZE = int(os.getenv("GRAPH_HTTP_POOL_SIZE", "16"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "5"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "30"))
+
+# Cache de resultados de sentimiento
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "10000"))
+SENTIMENT_CACHE_DB = os.getenv("SENTIMENT_CACHE_DB", "true").lower() == "true"
+
+# Carga de modelos de sentimiento: "true" los carga al arrancar la app
+SENTIMENT_WARMUP = os.getenv("SENTIMENT_WARMUP", "false").lower() == "true"
+
+# Modo de inferencia: "inline" (en el hilo que llama) o "process" (pool de workers)
+SENTIMENT_MODE = os.getenv("SENTIMENT_MODE", "inline")
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "2"))
+SENTIMENT_THREADS_PER_WORKER = int(
+    os.getenv("SENTIMENT_THREADS_PER_WORKER", str(max((os.cpu_count() or 2) // 2, 1))))
+SENTIMENT_MP_START = os.getenv("SENTIMENT_MP_START", "spawn")
+
+# Backend de inferencia: "torch", "torch-int8" (cuantización dinámica) u "onnx"
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+# Hilos de torch/onnxruntime en modo inline (0 = valor por defecto de la librería)
+SENTIMENT_THREADS = int(os.getenv("SENTIMENT_THREADS", "0"))
+
+# Cascada de sentimiento: BETO escala al modelo secundario bajo este umbral
+SENTIMENT_UMBRAL_CONFIANZA = float(os.getenv("SENTIMENT_UMBRAL_CONFIANZA", "0.7"))
+SENTIMENT_PESO_SECUNDARIO = float(os.getenv("SENTIMENT_PESO_SECUNDARIO", "0.5"))
+SENTIMENT_TEMPERATURA_PRINCIPAL = float(
+    os.getenv("SENTIMENT_TEMPERATURA_PRINCIPAL", "1.0"))
+SENTIMENT_TEMPERATURA_SECUNDARIO = float(
+    os.getenv("SENTIMENT_TEMPERATURA_SECUNDARIO", "1.0"))
+
+# Cache de respuestas de la API ("memory" o "redis")
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Jobs de sincronización en segundo plano
+SYNC_JOB_WORKERS = int(os.getenv("SYNC_JOB_WORKERS", "2"))
+SYNC_JOB_RETENTION = int(os.getenv("SYNC_JOB_RETENTION", "3600"))
+
+# Tamaño de página (`limit=`) al recorrer edges de la Graph API
+GRAPH_PAGE_LIMIT = int(os.getenv("GRAPH_PAGE_LIMIT", "100"))
+
+# Regulación de ritmo frente a la Graph API (peticiones por segundo)
+GRAPH_RATE_PER_TOKEN = float(os.getenv("GRAPH_RATE_PER_TOKEN", "20"))
+GRAPH_RATE_PER_PAGE = float(os.getenv("GRAPH_RATE_PER_PAGE", "10"))
+GRAPH_RATE_BURST = int(os.getenv("GRAPH_RATE_BURST", "10"))
+# Porcentaje de uso (cabeceras X-*-Usage) a partir del cual se frena
+GRAPH_USAGE_SLOWDOWN = float(os.getenv("GRAPH_USAGE_SLOWDOWN", "70"))
+# Reintentos ante throttling y errores 5xx
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "5"))
+GRAPH_BACKOFF_BASE = float(os.getenv("GRAPH_BACKOFF_BASE", "1"))
+GRAPH_BACKOFF_MAX = float(os.getenv("GRAPH_BACKOFF_MAX", "60"))
+
+# Sync con expansión de campos: posts, comentarios y reacciones en una sola
+# consulta (los edges truncados se completan paginando por post)
+SYNC_FIELD_EXPANSION = os.getenv("SYNC_FIELD_EXPANSION", "false").lower() == "true"
+GRAPH_EXPAND_POSTS_LIMIT = int(os.getenv("GRAPH_EXPAND_POSTS_LIMIT", "25"))
+GRAPH_EXPAND_COMMENTS_LIMIT = int(os.getenv("GRAPH_EXPAND_COMMENTS_LIMIT", "50"))
+
+# Sync masivo de todos los usuarios: jobs simultáneos en total y por token
+SYNC_BULK_WORKERS = int(os.getenv("SYNC_BULK_WORKERS", "4"))
+SYNC_BULK_PER_TOKEN = int(os.getenv("SYNC_BULK_PER_TOKEN", "1"))
+
+# Segundos que se cachea en el proceso el contexto (token y página) de un usuario
+TENANT_CONTEXT_TTL = int(os.getenv("TENANT_CONTEXT_TTL", "60"))
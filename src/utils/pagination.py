@@ -0,0 +1,42 @@
+import base64
+import json
+from datetime import datetime
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_time, row_id):
+    """Cursor opaco para la paginación por (created_time, id)."""
+    if isinstance(created_time, datetime):
+        created_time = created_time.isoformat()
+    raw = json.dumps([created_time, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        created_time, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_time), row_id
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def parse_limit(value):
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    if value < 1:
+        raise ValueError("limit debe ser mayor que 0")
+    return min(value, MAX_PAGE_SIZE)
+
+
+def parse_fields(value, allowed):
+    """Valida `fields=a,b,c` contra las columnas permitidas; None si no se pidió."""
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Campos no permitidos: {', '.join(unknown)}")
+    return fields
@@ -0,0 +1,31 @@
+from flask import Response, json, stream_with_context
+
+
+STREAM_FORMATS = ("json", "ndjson")
+
+
+def stream_rows(rows, fmt="json"):
+    """
+    Respuesta Flask que serializa `rows` (cualquier iterable) a medida que se
+    envía: un arreglo JSON (`json`) o un objeto por línea (`ndjson`).
+    """
+    if fmt not in STREAM_FORMATS:
+        raise ValueError(f"Formato de streaming desconocido: {fmt}")
+
+    def generate_json():
+        yield "["
+        first = True
+        for row in rows:
+            yield ("" if first else ",") + json.dumps(row)
+            first = False
+        yield "]\n"
+
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(row) + "\n"
+
+    if fmt == "ndjson":
+        return Response(stream_with_context(generate_ndjson()),
+                        mimetype="application/x-ndjson")
+    return Response(stream_with_context(generate_json()),
+                    mimetype="application/json")